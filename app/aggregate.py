@@ -0,0 +1,725 @@
+"""
+set-based aggregation for the analysis endpoints
+
+Instead of querying per school and per year, load every school/year/race/count_type
+sum from the school_year_rollups table with a fixed number of grouped queries, compute
+the metrics column by column in a DataFrame and only build the nested results at the end.
+"""
+
+import itertools
+import logging
+import numpy as np
+import pandas as pd
+from sqlalchemy import Float, Integer, Select, and_, case, cast, func, or_, select
+from sqlalchemy.orm import Session
+from app.models import HighSchool, HSPopulation, SchoolYearRollup
+
+logger = logging.getLogger(__name__)
+
+RACES = ["All", "Asian"]
+
+
+def distinct_years_query() -> Select:
+    return select(SchoolYearRollup.year).distinct()
+
+
+def distinct_years(session: Session) -> list[str]:
+    return list(session.scalars(distinct_years_query()))
+
+
+def distinct_campuses(session: Session) -> list[str]:
+    return list(
+        session.scalars(
+            select(SchoolYearRollup.campus).distinct().order_by(SchoolYearRollup.campus)
+        )
+    )
+
+
+def resolve_loop_years(
+    all_years: list[str], select_year: str | int = "all"
+) -> list[str]:
+    if select_year != "all" and str(select_year) in all_years:
+        return [str(select_year)]
+    return all_years
+
+
+def school_names_subquery(select_school_type: str = "all"):
+    """
+    Names of the schools that have admission counts, optionally limited to a school category.
+    """
+    stmt = (
+        select(HighSchool.name)
+        .join(SchoolYearRollup, SchoolYearRollup.school_id == HighSchool.id)
+        .distinct()
+    )
+    if select_school_type in ["public", "private"]:
+        stmt = stmt.filter(HighSchool.category == select_school_type)
+    return stmt.scalar_subquery()
+
+
+def school_name_filters(select_school_type: str = "all", schools=None):
+    """
+    Filters restricting HighSchool.name to the given schools, or to the school category.
+    """
+    if schools is not None:
+        return [HighSchool.name.in_(schools)]
+    if select_school_type in ["public", "private"]:
+        return [HighSchool.name.in_(school_names_subquery(select_school_type))]
+    return []
+
+
+# per school/year count columns of load_school_counts, None/NaN when there were no rows
+COUNT_COLUMNS = [
+    "all_app",
+    "all_adm",
+    "all_enr",
+    "all_students",
+    "asian_app",
+    "asian_adm",
+    "asian_enr",
+    "asian_students",
+]
+
+# (metric, numerator, denominator, fallback, numerator_required), see safe_ratio; the
+# fallback is reported instead of NaN, fallbacks and conditions are the ones of
+# benchmarks.legacy.school_year_result
+RATIOS = [
+    ("asian_student_percentage", "asian_students", "all_students", 0, True),
+    ("all_app_all_student", "all_app", "all_students", None, False),
+    ("asian_app_asian_student", "asian_app", "asian_students", 0, True),
+    ("asian_app_all_student", "asian_app", "all_students", 0, True),
+    ("all_adm_all_student", "all_adm", "all_students", None, False),
+    ("asian_adm_asian_student", "asian_adm", "asian_students", 0, True),
+    ("asian_adm_all_student", "asian_adm", "all_students", 0, True),
+    ("all_percentage", "all_adm", "all_app", None, False),
+    ("asian_percentage", "asian_adm", "asian_app", None, False),
+    ("all_enr_all_adm", "all_enr", "all_adm", None, True),
+    ("asian_enr_asian_adm", "asian_enr", "asian_adm", None, True),
+    ("asian_enr_all_adm", "asian_enr", "all_adm", None, True),
+]
+
+# {response section: [(response key, column)]} of one school/year result
+RESULT_LAYOUT = {
+    "student_demo": [
+        ("all_student_count", "all_students"),
+        ("asian_student_count", "asian_students"),
+        ("asian_student_percentage", "asian_student_percentage"),
+    ],
+    "application/student": [
+        (metric, metric)
+        for metric in [
+            "all_app_all_student",
+            "asian_app_asian_student",
+            "asian_app_all_student",
+            "all_adm_all_student",
+            "asian_adm_asian_student",
+            "asian_adm_all_student",
+        ]
+    ],
+    "admission/application": [
+        ("all_app", "all_app"),
+        ("all_adm", "all_adm"),
+        ("all_percentage", "all_percentage"),
+        ("asian_app", "asian_app"),
+        ("asian_adm", "asian_adm"),
+        ("asian_percentage", "asian_percentage"),
+    ],
+    # the lower the enrollment/admission percentage, the larger chance that the student
+    # land on a better university.
+    "enrollment/admission": [
+        ("all_enr_count", "all_enr"),
+        ("asian_enr_count", "asian_enr"),
+        ("all_enr_all_adm", "all_enr_all_adm"),
+        ("asian_enr_asian_adm", "asian_enr_asian_adm"),
+        ("asian_enr_all_adm", "asian_enr_all_adm"),
+    ],
+}
+
+
+def load_school_counts(
+    session: Session,
+    years: list[str],
+    select_campus: str = "all",
+    select_school_type: str = "all",
+    schools: list[str] | None = None,
+    by_campus: bool = False,
+) -> pd.DataFrame:
+    """
+    Sum the rollup rows per school name and year in one GROUP BY query, the races side
+    by side.
+
+    :param by_campus, bool, one row per school, year and campus instead
+    :return DataFrame, columns school, year, (campus,) all_rows (rollup rows of race
+        "All") and COUNT_COLUMNS as floats
+    """
+    stmt = school_counts_query(
+        years,
+        select_campus=select_campus,
+        select_school_type=select_school_type,
+        schools=schools,
+        by_campus=by_campus,
+    )
+    return school_counts_frame(session.execute(stmt).all(), by_campus=by_campus)
+
+
+def school_counts_query(
+    years: list[str],
+    select_campus: str = "all",
+    select_school_type: str = "all",
+    schools: list[str] | None = None,
+    by_campus: bool = False,
+) -> Select:
+    group_by = [HighSchool.name, SchoolYearRollup.year]
+    if by_campus:
+        group_by.append(SchoolYearRollup.campus)
+
+    def race_total(column, race: str):
+        return func.sum(column).filter(SchoolYearRollup.race == race)
+
+    def race_students(race: str):
+        # the same for every campus of a school
+        return func.max(SchoolYearRollup.student_count).filter(
+            SchoolYearRollup.race == race
+        )
+
+    stmt = (
+        select(
+            *group_by,
+            func.count().filter(SchoolYearRollup.race == "All"),
+            race_total(SchoolYearRollup.app_count, "All"),
+            race_total(SchoolYearRollup.adm_count, "All"),
+            race_total(SchoolYearRollup.enr_count, "All"),
+            race_students("All"),
+            race_total(SchoolYearRollup.app_count, "Asian"),
+            race_total(SchoolYearRollup.adm_count, "Asian"),
+            race_total(SchoolYearRollup.enr_count, "Asian"),
+            race_students("Asian"),
+        )
+        .join(HighSchool, HighSchool.id == SchoolYearRollup.school_id)
+        .filter(
+            SchoolYearRollup.year.in_(years),
+            SchoolYearRollup.race.in_(RACES),
+            *school_name_filters(select_school_type, schools),
+        )
+        .group_by(*group_by)
+    )
+    if select_campus not in ["all", "individual"]:
+        stmt = stmt.filter(SchoolYearRollup.campus == select_campus)
+    return stmt
+
+
+def school_counts_frame(rows: list, by_campus: bool = False) -> pd.DataFrame:
+    """
+    load_school_counts of the rows of school_counts_query.
+    """
+    counts = pd.DataFrame.from_records(
+        rows,
+        columns=[
+            "school",
+            "year",
+            *(["campus"] if by_campus else []),
+            "all_rows",
+            *COUNT_COLUMNS,
+        ],
+    )
+    counts[COUNT_COLUMNS] = counts[COUNT_COLUMNS].astype(float)
+    return counts
+
+
+def safe_ratio(
+    numerator: np.ndarray, denominator: np.ndarray, numerator_required: bool = True
+) -> np.ndarray:
+    """
+    numerator / denominator for every row, NaN where the denominator is missing or 0, or
+    the numerator is missing or, if numerator_required, 0.
+    """
+    valid = (denominator != 0) & ~np.isnan(denominator) & ~np.isnan(numerator)
+    if numerator_required:
+        valid &= numerator != 0
+    return np.divide(
+        numerator, denominator, out=np.full(len(numerator), np.nan), where=valid
+    )
+
+
+def school_metrics(counts: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add a column for every metric in RATIOS to the counts of load_school_counts.
+    """
+    columns = {column: counts[column].to_numpy(float) for column in COUNT_COLUMNS}
+    metrics = pd.DataFrame(
+        {
+            metric: safe_ratio(columns[numerator], columns[denominator], required)
+            for metric, numerator, denominator, _, required in RATIOS
+        },
+        index=counts.index,
+    )
+    return pd.concat([counts, metrics], axis=1)
+
+
+def column_values(column: pd.Series, missing=None, as_int: bool = False) -> list:
+    """
+    Column as a list of python numbers, missing for NaN.
+    """
+    array = column.to_numpy(float)
+    missing_rows = np.isnan(array)
+    if as_int:
+        array = np.nan_to_num(array).astype(np.int64)
+    values = array.astype(object)
+    values[missing_rows] = missing
+    return values.tolist()
+
+
+def school_year_results(metrics: pd.DataFrame) -> list[dict]:
+    """
+    The rows of school_metrics in the response shape, {section: {key: value}}.
+    """
+    fallbacks = {metric: fallback for metric, _, _, fallback, _ in RATIOS}
+    sections = []
+    for fields in RESULT_LAYOUT.values():
+        keys = [key for key, _ in fields]
+        columns = [
+            column_values(
+                metrics[column],
+                missing=fallbacks.get(column),
+                as_int=column in COUNT_COLUMNS,
+            )
+            for _, column in fields
+        ]
+        sections.append([dict(zip(keys, row)) for row in zip(*columns)])
+    return [dict(zip(RESULT_LAYOUT, row)) for row in zip(*sections)]
+
+
+def load_school_info(
+    session: Session,
+    select_school_type: str = "all",
+    schools: list[str] | None = None,
+) -> dict:
+    """
+    :return dict, {school name: {"category", "name", "city"}} of the first school with that name
+    """
+    return school_info_dict(
+        session.execute(school_info_query(select_school_type, schools)).all()
+    )
+
+
+def school_info_query(
+    select_school_type: str = "all", schools: list[str] | None = None
+) -> Select:
+    return (
+        select(HighSchool.category, HighSchool.name, HighSchool.city)
+        .filter(*school_name_filters(select_school_type, schools))
+        .order_by(HighSchool.id)
+    )
+
+
+def school_info_dict(rows: list) -> dict:
+    info = {}
+    for category, name, city in rows:
+        info.setdefault(name, {"category": category, "name": name, "city": city})
+    return info
+
+
+def load_latest_populations(
+    session: Session, school_ids: list[int] | None = None
+) -> dict:
+    """
+    Latest 12th grade enrollment of many schools in one statement, like
+    HighSchool.population without loading every population row per school.
+
+    :param school_ids, list, only these schools, all schools with enrollment by default
+    :return dict, {school id: {"year", "counts": {race: count}}}
+    """
+    year = cast(HSPopulation.year, Integer)
+    enrollments = select(
+        HSPopulation.school_id,
+        HSPopulation.year,
+        HSPopulation.race,
+        HSPopulation.count,
+        (year == func.max(year).over(partition_by=HSPopulation.school_id)).label(
+            "is_latest"
+        ),
+    ).filter(HSPopulation.count_type == "hs_enr", HSPopulation.sub_race.is_(None))
+    if school_ids is not None:
+        enrollments = enrollments.filter(HSPopulation.school_id.in_(school_ids))
+    enrollments = enrollments.subquery("enrollments")
+
+    populations = {}
+    for school_id, year, race, count in session.execute(
+        select(
+            enrollments.c.school_id,
+            enrollments.c.year,
+            enrollments.c.race,
+            enrollments.c.count,
+        ).filter(enrollments.c.is_latest)
+    ):
+        population = populations.setdefault(school_id, {"year": year, "counts": {}})
+        population["counts"][race] = count
+    return populations
+
+
+def analysis_years(
+    session: Session, select_year: str | int = "all"
+) -> tuple[list[str], str]:
+    """
+    :return tuple, (years to report, the most recent of them which results are ranked by)
+    """
+    return report_years(distinct_years(session), select_year)
+
+
+def report_years(
+    all_years: list[str], select_year: str | int = "all"
+) -> tuple[list[str], str]:
+    """
+    analysis_years of the given distinct years.
+    """
+    loop_years = resolve_loop_years(all_years, select_year)
+    sort_by_year = str(max([int(_) for _ in loop_years]))
+    return loop_years, sort_by_year
+
+
+def load_school_metrics(
+    session: Session,
+    loop_years: list[str],
+    select_campus: str = "all",
+    select_school_type: str = "all",
+    schools: list[str] | None = None,
+    by_campus: bool = False,
+) -> pd.DataFrame:
+    """
+    school_metrics of the school/years with admissions, by school name, most recent year
+    first (and campus name).
+
+    :param by_campus, bool, metrics per campus, see load_school_counts. A school's year is
+        kept when any campus had admissions, with all of its campuses
+    """
+    counts = load_school_counts(
+        session,
+        loop_years,
+        select_campus=select_campus,
+        select_school_type=select_school_type,
+        schools=schools,
+        by_campus=by_campus,
+    )
+    return valid_school_metrics(counts, loop_years)
+
+
+def valid_school_metrics(counts: pd.DataFrame, loop_years: list[str]) -> pd.DataFrame:
+    """
+    load_school_metrics of counts shaped like those of load_school_counts.
+    """
+    by_campus = "campus" in counts
+    keys = ["school", "year", "campus"] if by_campus else ["school", "year"]
+
+    # same rules as benchmarks.legacy.school_year_result for skipping a school's year
+    no_count_data = counts["all_rows"].eq(0)
+    has_admissions = counts["all_adm"].fillna(0).ne(0) | counts["asian_adm"].fillna(
+        0
+    ).ne(0)
+    if by_campus:
+        has_admissions = has_admissions.groupby(
+            [counts["school"], counts["year"]]
+        ).transform("any")
+    no_admissions = ~no_count_data & ~has_admissions
+    if logger.isEnabledFor(logging.DEBUG):
+        for group in counts.loc[no_count_data, keys].itertuples(index=False):
+            logger.debug("No count_data for %s", "/".join(group))
+        for group in counts.loc[no_admissions, keys].itertuples(index=False):
+            logger.debug(
+                "Skip school for year because admission rate is 0 or no data: %s",
+                "/".join(group),
+            )
+
+    metrics = school_metrics(
+        counts[~(no_count_data | no_admissions)].sort_values(
+            keys, ascending=[True, False, True][: len(keys)]
+        )
+    )
+    logger.info(
+        "Aggregated %d groups into %d schools for years %s, skipped groups: %s",
+        len(counts),
+        metrics["school"].nunique(),
+        loop_years,
+        {
+            reason: int(skipped.sum())
+            for reason, skipped in [
+                ("no count data", no_count_data),
+                ("no admissions", no_admissions),
+            ]
+            if skipped.any()
+        },
+    )
+    return metrics
+
+
+def school_results(metrics: pd.DataFrame, school_info: dict) -> dict:
+    """
+    Nest the rows of load_school_metrics per school, in their order. Rows by campus are
+    nested under the campus name within the year, next to the year's student_demo.
+    """
+    by_campus = "campus" in metrics
+    campuses = metrics["campus"] if by_campus else itertools.repeat(None)
+    results = {}
+    for school, year, campus, year_res in zip(
+        metrics["school"], metrics["year"], campuses, school_year_results(metrics)
+    ):
+        if school not in results:
+            results[school] = {"school_info": school_info.get(school)}
+        if by_campus:
+            student_demo = year_res.pop("student_demo")
+            results[school].setdefault(year, {"student_demo": student_demo})[
+                campus
+            ] = year_res
+        else:
+            results[school][year] = year_res
+    return results
+
+
+def school_rates(
+    session: Session,
+    loop_years: list[str],
+    select_campus: str = "all",
+    select_school_type: str = "all",
+    schools: list[str] | None = None,
+) -> dict:
+    """
+    Unsorted per school results for select_campus "all", "individual" or a campus name.
+
+    :param schools, list, only build results for these school names
+    :return dict, results keyed by school name
+    """
+    metrics = load_school_metrics(
+        session,
+        loop_years,
+        select_campus=select_campus,
+        select_school_type=select_school_type,
+        schools=schools,
+        by_campus=select_campus == "individual",
+    )
+    return school_results(
+        metrics, load_school_info(session, select_school_type, schools)
+    )
+
+
+def rank_school_metrics(metrics: pd.DataFrame, sort_by_year: str) -> list[str]:
+    """
+    Rank the schools of load_school_metrics like analyze_data.sort_school_results.
+
+    :return list, all school names in rank order
+    """
+    latest = metrics[metrics["year"] == sort_by_year].set_index("school")
+    first_sort_key = (
+        latest["all_adm_all_student"].fillna(latest["all_percentage"]).fillna(0)
+    )
+    second_sort_key = (-latest["all_enr_all_adm"]).fillna(-10)
+    keys = pd.DataFrame({"school": metrics["school"].unique()})
+    keys["first"] = keys["school"].map(first_sort_key).fillna(0)
+    keys["second"] = keys["school"].map(second_sort_key).fillna(-10)
+    # ties keep the school name order, like the stable python sort
+    return keys.sort_values(["first", "second"], ascending=False, kind="stable")[
+        "school"
+    ].tolist()
+
+
+def ranked_school_rates(
+    session: Session,
+    loop_years: list[str],
+    sort_by_year: str,
+    select_campus: str = "all",
+    select_school_type: str = "all",
+    offset: int = 0,
+    limit: int = 10,
+) -> dict:
+    """
+    One page of school_rates in rank order, ranked on the metrics so only the page is
+    turned into nested results. "individual" is ranked by the totals of all campuses.
+    """
+    metrics = load_school_metrics(
+        session,
+        loop_years,
+        select_campus=select_campus,
+        select_school_type=select_school_type,
+    )
+    page_schools = rank_school_metrics(metrics, sort_by_year)[offset : offset + limit]
+    if select_campus == "individual":
+        metrics = load_school_metrics(
+            session, loop_years, schools=page_schools, by_campus=True
+        )
+    results = school_results(
+        metrics[metrics["school"].isin(page_schools)],
+        load_school_info(session, schools=page_schools),
+    )
+    return {school: results[school] for school in page_schools}
+
+
+def rank_schools(
+    session: Session,
+    loop_years: list[str],
+    sort_by_year: str,
+    select_campus: str = "all",
+    select_school_type: str = "all",
+    offset: int = 0,
+    limit: int = 10,
+) -> list[str]:
+    """
+    One page of ranked_schools_query.
+
+    :return list, school names of the requested page in rank order
+    """
+    stmt = ranked_schools_query(
+        loop_years,
+        sort_by_year,
+        select_campus=select_campus,
+        select_school_type=select_school_type,
+    )
+    return list(session.scalars(stmt.offset(offset).limit(limit)))
+
+
+def seek_schools(
+    session: Session,
+    loop_years: list[str],
+    sort_by_year: str,
+    select_campus: str = "all",
+    select_school_type: str = "all",
+    after: tuple[float, float, str] | None = None,
+    limit: int = 10,
+) -> list:
+    """
+    The next limit schools of ranked_schools_query after the given sort keys, keyset
+    pagination that is not shifted by schools added or dropped before them.
+
+    :return list, (school, first_sort_key, second_sort_key) rows in rank order
+    """
+    stmt = ranked_schools_query(
+        loop_years,
+        sort_by_year,
+        select_campus=select_campus,
+        select_school_type=select_school_type,
+        after=after,
+    )
+    return session.execute(stmt.limit(limit)).all()
+
+
+def ranked_schools_query(
+    loop_years: list[str],
+    sort_by_year: str,
+    select_campus: str = "all",
+    select_school_type: str = "all",
+    after: tuple[float, float, str] | None = None,
+) -> Select:
+    """
+    Rank schools in SQL the same way analyze_data.sort_school_results does.
+
+    Highest all_adm_all_student of sort_by_year first, falling back to all_percentage (no student
+    count for private schools), then lowest all_enr_all_adm, then school name. select_campus
+    "individual" ranks by the totals of all campuses.
+
+    :param after, tuple, (first_sort_key, second_sort_key, school) of a ranked row, only
+        rank the schools after it
+    :return Select, (school, first_sort_key, second_sort_key) rows in rank order
+    """
+
+    def race_total(column, race: str):
+        return func.sum(column).filter(SchoolYearRollup.race == race)
+
+    totals_stmt = (
+        select(
+            HighSchool.name.label("school"),
+            SchoolYearRollup.year,
+            race_total(SchoolYearRollup.app_count, "All").label("all_app"),
+            race_total(SchoolYearRollup.adm_count, "All").label("all_adm"),
+            race_total(SchoolYearRollup.enr_count, "All").label("all_enr"),
+            race_total(SchoolYearRollup.adm_count, "Asian").label("asian_adm"),
+            func.max(SchoolYearRollup.student_count)
+            .filter(SchoolYearRollup.race == "All")
+            .label("all_students"),
+            func.count().filter(SchoolYearRollup.race == "All").label("all_rows"),
+        )
+        .join(HighSchool, HighSchool.id == SchoolYearRollup.school_id)
+        .filter(
+            SchoolYearRollup.year.in_(loop_years),
+            SchoolYearRollup.race.in_(RACES),
+            *school_name_filters(select_school_type),
+        )
+        .group_by(HighSchool.name, SchoolYearRollup.year)
+    )
+    if select_campus not in ["all", "individual"]:
+        totals_stmt = totals_stmt.filter(SchoolYearRollup.campus == select_campus)
+    totals = totals_stmt.cte("totals")
+
+    # same rules as benchmarks.legacy.school_year_result for skipping a school's year
+    valid_years = (
+        select(totals)
+        .filter(
+            totals.c.all_rows > 0,
+            or_(
+                func.coalesce(totals.c.all_adm, 0) != 0,
+                func.coalesce(totals.c.asian_adm, 0) != 0,
+            ),
+        )
+        .cte("valid_years")
+    )
+    ranked_schools = select(valid_years.c.school).distinct().subquery("ranked_schools")
+    latest = (
+        select(valid_years)
+        .filter(valid_years.c.year == sort_by_year)
+        .subquery("latest")
+    )
+    all_adm = cast(latest.c.all_adm, Float)
+    all_adm_all_student = case(
+        (
+            and_(
+                latest.c.all_adm.is_not(None),
+                func.coalesce(latest.c.all_students, 0) != 0,
+            ),
+            all_adm / cast(latest.c.all_students, Float),
+        )
+    )
+    all_percentage = case(
+        (
+            func.coalesce(latest.c.all_app, 0) != 0,
+            all_adm / cast(latest.c.all_app, Float),
+        )
+    )
+    first_sort_key = func.coalesce(all_adm_all_student, all_percentage, 0.0)
+    second_sort_key = case(
+        (
+            and_(
+                func.coalesce(latest.c.all_adm, 0) != 0,
+                func.coalesce(latest.c.all_enr, 0) != 0,
+            ),
+            -1 * cast(latest.c.all_enr, Float) / all_adm,
+        ),
+        else_=-10.0,
+    )
+
+    ranking = (
+        select(
+            ranked_schools.c.school,
+            first_sort_key.label("first_sort_key"),
+            second_sort_key.label("second_sort_key"),
+        )
+        .outerjoin(latest, latest.c.school == ranked_schools.c.school)
+        .subquery("ranking")
+    )
+    # code point order, like the python sort this replaces
+    school = ranking.c.school.collate("C")
+    stmt = select(ranking).order_by(
+        ranking.c.first_sort_key.desc(), ranking.c.second_sort_key.desc(), school
+    )
+    if after is not None:
+        first, second, after_school = after
+        stmt = stmt.filter(
+            or_(
+                ranking.c.first_sort_key < first,
+                and_(
+                    ranking.c.first_sort_key == first,
+                    ranking.c.second_sort_key < second,
+                ),
+                and_(
+                    ranking.c.first_sort_key == first,
+                    ranking.c.second_sort_key == second,
+                    school > after_school,
+                ),
+            )
+        )
+    return stmt
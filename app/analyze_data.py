@@ -1,10 +1,11 @@
-""" 
+"""
 Analyze data from db.
 
 For each UC campus,
 1. Total admission/application percentage across all schools and all races.
 2. Total admission/application percentage across all schools for Asians.
 3. Above stats for each year.
+4. Application, admission and enrollment counts of every race.
 
 For each school,
 1. Total admission/application percentage across all campuses and all races.
@@ -15,72 +16,155 @@ For each school,
 
 """
 
+import base64
+import json
 import logging
 import itertools
 from collections import defaultdict
-from sqlalchemy import func
-from app.models import CountBySchool, HighSchool, HSPopulation
-from app.database import session_factory
+from collections.abc import Iterable, Iterator
+from sqlalchemy import Select, func, select
+from sqlalchemy.orm import Session
+from app.models import SchoolYearRollup
+from app.aggregate import (
+    analysis_years,
+    rank_school_metrics,
+    rank_schools,
+    ranked_school_rates,
+    ranked_schools_query,
+    report_years,
+    school_rates,
+    school_results,
+    seek_schools,
+    valid_school_metrics,
+)
+from app.database import async_session_factory, session_factory
+from app.schemas import (
+    CampusRates,
+    KeysetPage,
+    RaceRate,
+    SchoolRates,
+    SchoolResults,
+)
 
 logger = logging.getLogger(__name__)
 
+# schools built at a time by iter_school_rates
+EXPORT_BATCH_SIZE = 500
+
 
-def by_campus_rate() -> dict:
+def by_campus_rate() -> CampusRates:
     with session_factory() as session:
-        all_campuses_queryset = session.query(CountBySchool.campus).distinct().all()
-        all_campuses = [_.campus for _ in all_campuses_queryset]
-        print(f"Found distinct campuses: {all_campuses}")
-
-        all_years_queryset = session.query(CountBySchool.year).distinct().all()
-        all_years = [_.year for _ in all_years_queryset]
-        print(f"Found distinct years: {all_years}")
-
-        results = {}
-        for campus in all_campuses:
-            campus_res = {}
-            for year in all_years:
-                count_data = (
-                    session.query(
-                        CountBySchool.count_type, func.sum(CountBySchool.count)
-                    )
-                    .filter(
-                        CountBySchool.year == year,
-                        CountBySchool.campus == campus,
-                        CountBySchool.race == "All",
-                    )
-                    .group_by(CountBySchool.count_type)
-                    .all()
-                )
-                app_count = [_[1] for _ in count_data if _[0] == "App"][0]
-                adm_count = [_[1] for _ in count_data if _[0] == "Adm"][0]
-
-                asian_count_data = (
-                    session.query(
-                        CountBySchool.count_type, func.sum(CountBySchool.count)
-                    )
-                    .filter(
-                        CountBySchool.year == year,
-                        CountBySchool.campus == campus,
-                        CountBySchool.race == "Asian",
-                    )
-                    .group_by(CountBySchool.count_type)
-                    .all()
-                )
-                asian_app_count = [_[1] for _ in asian_count_data if _[0] == "App"][0]
-                asian_adm_count = [_[1] for _ in asian_count_data if _[0] == "Adm"][0]
-
-                campus_res[year] = {
-                    "all_app": app_count,
-                    "all_adm": adm_count,
-                    "all_percentage": adm_count / app_count,
-                    "asian_app": asian_app_count,
-                    "asian_adm": asian_adm_count,
-                    "asian_percentage": asian_adm_count / asian_app_count,
-                }
-
-            results[campus] = campus_res
-
-        return results
+        return campus_rates(session)
+
+
+async def by_campus_rate_async() -> CampusRates:
+    async with async_session_factory() as session:
+        return await session.run_sync(campus_rates)
+
+
+def campus_rates(session: Session) -> CampusRates:
+    """
+    Application, admission and enrollment counts of every campus and year, for every
+    race the importers stored, from one GROUP BY. Campus/year/race groups without rows,
+    or without App or Adm counts, have None counts and percentages.
+
+    :return dict, {campus: {year: {"all_*" and "asian_*" rates, "races": {race: rates}}}}
+    """
+    return campus_rate_matrix(session.execute(campus_counts_query()).all())
+
+
+def campus_counts_query() -> Select:
+    return select(
+        SchoolYearRollup.campus,
+        SchoolYearRollup.year,
+        SchoolYearRollup.race,
+        func.sum(SchoolYearRollup.app_count),
+        func.sum(SchoolYearRollup.adm_count),
+        func.sum(SchoolYearRollup.enr_count),
+    ).group_by(SchoolYearRollup.campus, SchoolYearRollup.year, SchoolYearRollup.race)
+
+
+def campus_rate_matrix(count_data: Iterable[tuple]) -> CampusRates:
+    """
+    campus_rates of (campus, year, race, app, adm, enr) sums.
+    """
+    counts = {
+        (campus, year, race): (app, adm, enr)
+        for campus, year, race, app, adm, enr in count_data
+    }
+    campuses = sorted({campus for campus, _, _ in counts})
+    years = sorted({year for _, year, _ in counts})
+    races = sorted({race for _, _, race in counts})
+    results = defaultdict(dict)
+    for campus, year in itertools.product(campuses, years):
+        race_res = {
+            race: race_rate(*counts.get((campus, year, race), (None, None, None)))
+            for race in races
+        }
+        all_res = race_res.get("All") or race_rate(None, None, None)
+        asian_res = race_res.get("Asian") or race_rate(None, None, None)
+        results[campus][year] = {
+            "all_app": all_res["app"],
+            "all_adm": all_res["adm"],
+            "all_percentage": all_res["percentage"],
+            "asian_app": asian_res["app"],
+            "asian_adm": asian_res["adm"],
+            "asian_percentage": asian_res["percentage"],
+            "races": race_res,
+        }
+
+    return dict(results)
+
+
+def race_rate(app: int | None, adm: int | None, enr: int | None) -> RaceRate:
+    return {
+        "app": app,
+        "adm": adm,
+        "enr": enr,
+        "percentage": adm / app if app and adm is not None else None,
+    }
+
+
+def get_first_sort_key(input: dict, sort_by_year: str) -> float:
+    first_choice = (
+        input.get(sort_by_year, {})
+        .get("application/student", {})
+        .get("all_adm_all_student")
+    )
+    if first_choice is not None:
+        return first_choice
+    sec_choice = (
+        input.get(sort_by_year, {})
+        .get("admission/application", {})
+        .get("all_percentage")
+    )
+    if sec_choice is not None:
+        return sec_choice
+    return 0
+
+
+def get_second_sort_key(input: dict, sort_by_year: str) -> float:
+    all_enr_all_adm = (
+        input.get(sort_by_year, {})
+        .get("enrollment/admission", {})
+        .get("all_enr_all_adm")
+    )
+    return -1 * all_enr_all_adm if all_enr_all_adm else -10
+
+
+def sort_school_results(results: dict, sort_by_year: str) -> dict:
+    # sort by highest all_adm_all_student or all_percentage(missing student # for private schools)
+    # secondary sort by lowest all_enr_all_adm
+    return dict(
+        sorted(
+            results.items(),
+            key=lambda x: (
+                get_first_sort_key(x[1], sort_by_year),
+                get_second_sort_key(x[1], sort_by_year),
+            ),
+            reverse=True,
+        )
+    )
 
 
 def by_school_rate(
@@ -89,404 +173,272 @@ def by_school_rate(
     select_school_type: str = "all",
     offset: int = 0,
     limit: int = 10,
-) -> dict:
+    rank_in_sql: bool = True,
+) -> SchoolRates:
     """
-    :param select_campus, str, can be "all", "individual", or specific campus name
+    :param select_campus, str, can be "all", "individual", or specific campus name.
+        "individual" reports every campus separately, ranked like "all"
     :param select_school_type, str, can be "all", "public" or "private"
+    :param rank_in_sql, bool, rank schools in the database and only build results for the
+        requested page, instead of ranking every school in memory
     """
     with session_factory() as session:
-        if select_school_type not in ["public", "private"]:
-            all_schools_queryset = session.query(CountBySchool.school).distinct().all()
-        else:
-            all_schools_queryset = (
-                session.query(CountBySchool.school)
-                .join(HighSchool, CountBySchool.school_id == HighSchool.id)
-                .filter(HighSchool.category == select_school_type)
-                .distinct()
-                .all()
-            )
-
-        all_schools = [_.school for _ in all_schools_queryset]
-        print(
-            f"Found distinct schools ({len(all_schools)}) for type {select_school_type}: {all_schools}"
+        return school_rate_page(
+            session,
+            select_campus=select_campus,
+            select_year=select_year,
+            select_school_type=select_school_type,
+            offset=offset,
+            limit=limit,
+            rank_in_sql=rank_in_sql,
+        )
+
+
+async def by_school_rate_async(
+    select_campus: str = "individual",
+    select_year: str | int = "all",
+    select_school_type: str = "all",
+    offset: int = 0,
+    limit: int = 10,
+    rank_in_sql: bool = True,
+) -> SchoolRates:
+    """
+    by_school_rate on the asyncpg engine, the queries are awaited instead of blocking
+    a thread.
+    """
+    async with async_session_factory() as session:
+        return await session.run_sync(
+            school_rate_page,
+            select_campus=select_campus,
+            select_year=select_year,
+            select_school_type=select_school_type,
+            offset=offset,
+            limit=limit,
+            rank_in_sql=rank_in_sql,
         )
 
-        all_years_queryset = session.query(CountBySchool.year).distinct().all()
-        all_years = [_.year for _ in all_years_queryset]
-        print(f"Found distinct years: {all_years}")
-
-        loop_years = all_years
-        if select_year != "all":
-            if str(select_year) in all_years:
-                loop_years = [str(select_year)]
-
-        sort_by_year = str(max([int(_) for _ in loop_years]))
-
-        print(f"Loop data for years: {loop_years}")
-
-        all_campuses_queryset = session.query(CountBySchool.campus).distinct().all()
-        all_campuses = [_.campus for _ in all_campuses_queryset]
-        print(f"Found distinct campuses: {all_campuses}")
-
-        results = {}
-        skipped_school_count = 0
-        all_school_count = 0
-        for school in all_schools:
-            all_school_count += 1
-            school_res = {}
-            for year in loop_years:
-                ######### Get school info ##################
-                school_obj = (
-                    session.query(HighSchool.category, HighSchool.name, HighSchool.city)
-                    .filter(HighSchool.name == school)
-                    .first()
-                )
-                school_info = school_obj._asdict()
-
-                ######### Get student demographics data ##################
-                # get the high school 12th grade enrollment population
-                hs_enr_data = (
-                    session.query(HSPopulation.race, HSPopulation.count)
-                    .join(HighSchool, HighSchool.id == HSPopulation.school_id)
-                    .filter(
-                        HighSchool.name == school,
-                        HSPopulation.count_type == "hs_enr",
-                        HSPopulation.year == year,
-                    )
-                    .all()
-                )
-                all_enr_count = None
-                asian_enr_count = None
-                if hs_enr_data:
-                    all_enr_count = [_.count for _ in hs_enr_data if _.race == "All"]
-                    all_enr_count = all_enr_count[0] if all_enr_count else None
-                    asian_enr_count = [
-                        _.count for _ in hs_enr_data if _.race == "Asian"
-                    ]
-                    asian_enr_count = asian_enr_count[0] if asian_enr_count else None
-
-                student_demo = {
-                    "all_student_count": all_enr_count,
-                    "asian_student_count": asian_enr_count,
-                    "asian_student_percentage": (
-                        asian_enr_count / all_enr_count
-                        if (asian_enr_count and all_enr_count)
-                        else 0
-                    ),
-                }
-
-                ########## Get admission/application rate ####################
-                indiv_campus_dict = defaultdict(lambda: defaultdict(dict))
-                select_clause = [CountBySchool.count_type]
-                group_by_clause = [CountBySchool.count_type]
-                filter_clause = [
-                    CountBySchool.year == year,
-                    CountBySchool.school == school,
-                    CountBySchool.race == "All",
-                ]
-                filter_clause_2 = [
-                    CountBySchool.year == year,
-                    CountBySchool.school == school,
-                    CountBySchool.race == "Asian",
-                ]
-                if select_campus == "individual":
-                    select_clause.append(CountBySchool.campus)
-                    group_by_clause.append(CountBySchool.campus)
-                elif select_campus != "all":
-                    # specified a campus name
-                    filter_clause.append(CountBySchool.campus == select_campus)
-                    filter_clause_2.append(CountBySchool.campus == select_campus)
-
-                select_clause.append(func.sum(CountBySchool.count))
-                count_data = (
-                    session.query(*select_clause)
-                    .filter(*filter_clause)
-                    .group_by(*group_by_clause)
-                    .all()
-                )
-
-                if not count_data:
-                    print(f"No count_data for {school=}, {year=}")
-                    continue
-
-                if select_campus == "individual":
-                    for row in count_data:
-                        if row[0] == "App":
-                            indiv_campus_dict[row[1]]["admission/application"][
-                                "all_app"
-                            ] = row[2]
-                        if row[0] == "Adm":
-                            indiv_campus_dict[row[1]]["admission/application"][
-                                "all_adm"
-                            ] = row[2]
-                    for k in indiv_campus_dict.keys():
-                        indiv_campus_dict[k]["admission/application"][
-                            "all_percentage"
-                        ] = (
-                            indiv_campus_dict[k]["admission/application"].get(
-                                "all_adm", 0
-                            )
-                            / indiv_campus_dict[k]["admission/application"].get(
-                                "all_app", 0
-                            )
-                            if indiv_campus_dict[k]["admission/application"].get(
-                                "all_app", 0
-                            )
-                            > 0
-                            else None
-                        )
-                else:
-                    app_count = [_[1] for _ in count_data if _[0] == "App"][0]
-                    adm_count = [_[1] for _ in count_data if _[0] == "Adm"][0]
-                    enr_count = [_[1] for _ in count_data if _[0] == "Enr"]
-                    enr_count = enr_count[0] if enr_count else None
-
-                asian_count_data = (
-                    session.query(*select_clause)
-                    .filter(*filter_clause_2)
-                    .group_by(*group_by_clause)
-                    .all()
-                )
-                if select_campus == "individual":
-                    for row in asian_count_data:
-                        if row[0] == "App":
-                            indiv_campus_dict[row[1]]["admission/application"][
-                                "asian_app"
-                            ] = row[2]
-                        if row[0] == "Adm":
-                            indiv_campus_dict[row[1]]["admission/application"][
-                                "asian_adm"
-                            ] = row[2]
-                    for k in indiv_campus_dict.keys():
-                        indiv_campus_dict[k]["admission/application"][
-                            "asian_percentage"
-                        ] = (
-                            indiv_campus_dict[k]["admission/application"].get(
-                                "asian_adm", 0
-                            )
-                            / indiv_campus_dict[k]["admission/application"].get(
-                                "asian_app", 0
-                            )
-                            if indiv_campus_dict[k]["admission/application"].get(
-                                "asian_app", 0
-                            )
-                            > 0
-                            else None
-                        )
-                else:
-                    asian_app_count = [_[1] for _ in asian_count_data if _[0] == "App"][
-                        0
-                    ]
-                    asian_adm_count = [_[1] for _ in asian_count_data if _[0] == "Adm"][
-                        0
-                    ]
-                    asian_enr_count = [_[1] for _ in asian_count_data if _[0] == "Enr"]
-                    asian_enr_count = asian_enr_count[0] if asian_enr_count else None
-
-                ########## Get application/total student percentage ####################
-                app_student_data = {}
-                if select_campus == "individual":
-                    for k, v in indiv_campus_dict.items():
-                        v["application/student"]["all_app_all_student"] = (
-                            v["admission/application"].get("all_app", 0) / all_enr_count
-                            if all_enr_count
-                            else None
-                        )
-                        v["application/student"]["asian_app_asian_student"] = (
-                            v["admission/application"].get("asian_app", 0)
-                            / asian_enr_count
-                            if asian_enr_count
-                            else None
-                        )
-                        v["application/student"]["asian_app_all_student"] = (
-                            v["admission/application"].get("asian_app", 0)
-                            / all_enr_count
-                            if all_enr_count
-                            else None
-                        )
-                        v["application/student"]["all_adm_all_student"] = (
-                            v["admission/application"].get("all_adm", 0) / all_enr_count
-                            if all_enr_count
-                            else None
-                        )
-                        v["application/student"]["asian_adm_asian_student"] = (
-                            v["admission/application"].get("asian_adm", 0)
-                            / asian_enr_count
-                            if asian_enr_count
-                            else None
-                        )
-                        v["application/student"]["asian_adm_all_student"] = (
-                            v["admission/application"].get("asian_adm", 0)
-                            / all_enr_count
-                            if all_enr_count
-                            else None
-                        )
-                else:
-                    app_student_data["all_app_all_student"] = (
-                        app_count / all_enr_count if all_enr_count else None
-                    )
-                    app_student_data["asian_app_asian_student"] = (
-                        asian_app_count / asian_enr_count
-                        if (asian_app_count and asian_enr_count)
-                        else 0
-                    )
-                    app_student_data["asian_app_all_student"] = (
-                        asian_app_count / all_enr_count
-                        if (asian_app_count and all_enr_count)
-                        else 0
-                    )
-                    app_student_data["all_adm_all_student"] = (
-                        adm_count / all_enr_count if all_enr_count else None
-                    )
-                    app_student_data["asian_adm_asian_student"] = (
-                        asian_adm_count / asian_enr_count
-                        if (asian_adm_count and asian_enr_count)
-                        else 0
-                    )
-                    app_student_data["asian_adm_all_student"] = (
-                        asian_adm_count / all_enr_count
-                        if (asian_adm_count and all_enr_count)
-                        else 0
-                    )
-
-                ########## Get campus enrollment/admission percentage ####################
-                # the lower the enrollment/admission percentage, the larger chance that the student
-                # land on a better university.
-                enr_adm_data = {}
-                if select_campus == "individual":
-                    v["enrollment/admission"]["all_enr_count"] = enr_count
-                    v["enrollment/admission"]["asian_enr_count"] = asian_enr_count
-                    v["enrollment/admission"]["all_enr_all_adm"] = (
-                        enr_count / v["admission/application"].get("all_adm")
-                        if v["admission/application"].get("all_adm") and enr_count
-                        else None
-                    )
-                    v["enrollment/admission"]["asian_enr_asian_adm"] = (
-                        asian_enr_count / v["admission/application"].get("asian_adm")
-                        if v["admission/application"].get("asian_adm")
-                        and asian_enr_count
-                        else None
-                    )
-                    v["enrollment/admission"]["asian_enr_all_adm"] = (
-                        asian_enr_count / v["admission/application"].get("all_adm")
-                        if v["admission/application"].get("all_adm") and asian_enr_count
-                        else None
-                    )
-                else:
-                    enr_adm_data["all_enr_count"] = enr_count
-                    enr_adm_data["asian_enr_count"] = asian_enr_count
-                    enr_adm_data["all_enr_all_adm"] = (
-                        enr_count / adm_count if (adm_count and enr_count) else None
-                    )
-                    enr_adm_data["asian_enr_asian_adm"] = (
-                        asian_enr_count / asian_adm_count
-                        if (asian_adm_count and asian_enr_count)
-                        else None
-                    )
-                    enr_adm_data["asian_enr_all_adm"] = (
-                        asian_enr_count / adm_count
-                        if (adm_count and asian_enr_count)
-                        else None
-                    )
-
-                if select_campus == "individual":
-                    no_data = True
-                    for k, v in indiv_campus_dict.items():
-                        if (
-                            v["admission/application"]["asian_percentage"]
-                            or v["admission/application"]["all_percentage"]
-                        ):
-                            no_data = False
-                            break
-                    if no_data:
-                        print(
-                            f"Skip school for year because admission rate is 0 or no data: {school}/{year}"
-                        )
-                        continue
-                    school_res[year] = {
-                        "student_demo": student_demo,
-                        **dict(indiv_campus_dict),
-                    }
-                else:
-                    if not adm_count and not asian_adm_count:
-                        print(
-                            f"Skip school for year because admission rate is 0 or no data: {school}/{year}"
-                        )
-                        continue
-                    school_res[year] = {
-                        "student_demo": student_demo,
-                        "application/student": app_student_data,
-                        "admission/application": {
-                            "all_app": app_count,
-                            "all_adm": adm_count,
-                            "all_percentage": (
-                                adm_count / app_count if app_count else None
-                            ),
-                            "asian_app": asian_app_count,
-                            "asian_adm": asian_adm_count,
-                            "asian_percentage": (
-                                asian_adm_count / asian_app_count
-                                if asian_app_count
-                                else None
-                            ),
-                        },
-                        "enrollment/admission": enr_adm_data,
-                    }
-
-            if school_res:
-                # sort by most recent year
-                sorted_school_res = dict(sorted(school_res.items(), reverse=True))
-                results[school] = {"school_info": school_info, **sorted_school_res}
-            else:
-                skipped_school_count += 1
-                print(f"Skip school because admission rate is 0 or no data: {school}")
-
-        print(
-            f"Total {all_school_count} schools found and skipped {skipped_school_count}."
+
+def school_rate_page(
+    session: Session,
+    select_campus: str = "all",
+    select_year: str | int = "all",
+    select_school_type: str = "all",
+    offset: int = 0,
+    limit: int = 10,
+    rank_in_sql: bool = True,
+) -> SchoolRates:
+    loop_years, sort_by_year = analysis_years(session, select_year)
+    if rank_in_sql:
+        page_schools = rank_schools(
+            session,
+            loop_years,
+            sort_by_year,
+            select_campus=select_campus,
+            select_school_type=select_school_type,
+            offset=offset,
+            limit=limit,
+        )
+        results = school_rates(
+            session,
+            loop_years,
+            select_campus=select_campus,
+            select_school_type=select_school_type,
+            schools=page_schools,
         )
+        return {school: results[school] for school in page_schools}
+
+    return ranked_school_rates(
+        session,
+        loop_years,
+        sort_by_year,
+        select_campus=select_campus,
+        select_school_type=select_school_type,
+        offset=offset,
+        limit=limit,
+    )
+
+
+def backend_campus_rates(backend) -> CampusRates:
+    """
+    by_campus_rate from an analysis backend, see app.backends.
+    """
+    return campus_rate_matrix(backend.campus_counts())
+
 
-        # sort by highest all_adm_all_student or all_percentage(missing student # for private schools)
-        # secondary sort by lowest all_enr_all_adm
-        if select_campus != "individual":
-
-            def get_first_sort_key(input):
-                first_choice = (
-                    input.get(sort_by_year, {})
-                    .get("application/student", {})
-                    .get("all_adm_all_student")
-                )
-                if first_choice is not None:
-                    return first_choice
-                sec_choice = (
-                    input.get(sort_by_year, {})
-                    .get("admission/application", {})
-                    .get("all_percentage")
-                )
-                if sec_choice is not None:
-                    return sec_choice
-                return 0
-
-            results = dict(
-                sorted(
-                    results.items(),
-                    key=lambda x: (
-                        get_first_sort_key(x[1]),
-                        (
-                            -1
-                            * x[1][sort_by_year]["enrollment/admission"][
-                                "all_enr_all_adm"
-                            ]
-                            if x[1]
-                            .get(sort_by_year, {})
-                            .get("enrollment/admission", {})
-                            .get("all_enr_all_adm")
-                            else -10
-                        ),
-                    ),
-                    reverse=True,
-                )
-            )
-        sliced_dict = dict(
-            itertools.islice(results.items(), offset, (offset + limit), 1)
+def backend_school_rate_page(
+    backend,
+    select_campus: str = "all",
+    select_year: str | int = "all",
+    select_school_type: str = "all",
+    offset: int = 0,
+    limit: int = 10,
+) -> SchoolRates:
+    """
+    by_school_rate from an analysis backend, see app.backends. Ranked in memory like
+    aggregate.ranked_school_rates.
+    """
+    loop_years, sort_by_year = report_years(backend.years(), select_year)
+    metrics = valid_school_metrics(
+        backend.school_counts(
+            loop_years,
+            select_campus=select_campus,
+            select_school_type=select_school_type,
+        ),
+        loop_years,
+    )
+    page_schools = rank_school_metrics(metrics, sort_by_year)[offset : offset + limit]
+    if select_campus == "individual":
+        metrics = valid_school_metrics(
+            backend.school_counts(loop_years, schools=page_schools, by_campus=True),
+            loop_years,
+        )
+    results = school_results(
+        metrics[metrics["school"].isin(page_schools)],
+        backend.school_info(page_schools),
+    )
+    return {school: results[school] for school in page_schools}
+
+
+def encode_cursor(first_sort_key: float, second_sort_key: float, school: str) -> str:
+    """
+    Opaque /analyze cursor pointing after a ranked school, see school_rate_keyset_page.
+    """
+    return base64.urlsafe_b64encode(
+        json.dumps([first_sort_key, second_sort_key, school]).encode()
+    ).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[float, float, str]:
+    """
+    :raise ValueError, for a cursor that was not made by encode_cursor
+    """
+    try:
+        first_sort_key, second_sort_key, school = json.loads(
+            base64.urlsafe_b64decode(cursor.encode())
+        )
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor {cursor!r}") from e
+    if not (
+        isinstance(first_sort_key, (int, float))
+        and isinstance(second_sort_key, (int, float))
+        and isinstance(school, str)
+    ):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return first_sort_key, second_sort_key, school
+
+
+def by_school_rate_keyset(
+    select_campus: str = "all",
+    select_year: str | int = "all",
+    select_school_type: str = "all",
+    after: tuple[float, float, str] | None = None,
+    limit: int = 10,
+) -> KeysetPage:
+    with session_factory() as session:
+        return school_rate_keyset_page(
+            session,
+            select_campus=select_campus,
+            select_year=select_year,
+            select_school_type=select_school_type,
+            after=after,
+            limit=limit,
+        )
+
+
+async def by_school_rate_keyset_async(
+    select_campus: str = "all",
+    select_year: str | int = "all",
+    select_school_type: str = "all",
+    after: tuple[float, float, str] | None = None,
+    limit: int = 10,
+) -> KeysetPage:
+    async with async_session_factory() as session:
+        return await session.run_sync(
+            school_rate_keyset_page,
+            select_campus=select_campus,
+            select_year=select_year,
+            select_school_type=select_school_type,
+            after=after,
+            limit=limit,
+        )
+
+
+def school_rate_keyset_page(
+    session: Session,
+    select_campus: str = "all",
+    select_year: str | int = "all",
+    select_school_type: str = "all",
+    after: tuple[float, float, str] | None = None,
+    limit: int = 10,
+) -> KeysetPage:
+    """
+    One page of by_school_rate by keyset instead of offset: the schools ranked after the
+    sort keys of the previous page's last school. Imports between two pages do not shift
+    the next page. Every request still ranks all schools, no index covers the sort keys,
+    so deep pages cost about as much as with offset.
+
+    :param after, tuple, decode_cursor of the previous page's next_cursor, None for the
+        first page
+    :return dict, {"schools": results in rank order, "next_cursor": None on the last page}
+    """
+    loop_years, sort_by_year = analysis_years(session, select_year)
+    rows = seek_schools(
+        session,
+        loop_years,
+        sort_by_year,
+        select_campus=select_campus,
+        select_school_type=select_school_type,
+        after=after,
+        limit=limit,
+    )
+    page_schools = [row.school for row in rows]
+    results = school_rates(
+        session,
+        loop_years,
+        select_campus=select_campus,
+        select_school_type=select_school_type,
+        schools=page_schools,
+    )
+    next_cursor = None
+    if rows and len(rows) == limit:
+        next_cursor = encode_cursor(
+            rows[-1].first_sort_key, rows[-1].second_sort_key, rows[-1].school
+        )
+    return {
+        "schools": {school: results[school] for school in page_schools},
+        "next_cursor": next_cursor,
+    }
+
+
+def iter_school_rates(
+    session: Session,
+    loop_years: list[str],
+    sort_by_year: str,
+    select_campus: str = "all",
+    select_school_type: str = "all",
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[tuple[str, SchoolResults]]:
+    """
+    Every school of by_school_rate as (school name, results) in rank order, for exports.
+
+    The ranking is read through a server side cursor and results are built batch_size
+    schools at a time, so memory does not grow with the number of schools.
+    """
+    ranked = session.scalars(
+        ranked_schools_query(
+            loop_years,
+            sort_by_year,
+            select_campus=select_campus,
+            select_school_type=select_school_type,
+        ).execution_options(yield_per=batch_size)
+    )
+    for schools in ranked.partitions():
+        results = school_rates(
+            session,
+            loop_years,
+            select_campus=select_campus,
+            select_school_type=select_school_type,
+            schools=schools,
         )
-        return sliced_dict
+        for school in schools:
+            yield school, results[school]
@@ -0,0 +1,199 @@
+"""
+analysis backends for analyze_data.backend_campus_rates and backend_school_rate_page
+
+A backend answers the few questions the analysis asks its database: the distinct years,
+the school counts of aggregate.load_school_counts, the school info of
+aggregate.load_school_info and the campus counts of analyze_data.campus_rates.
+
+- SQLAlchemyBackend runs the statements of app.aggregate on a session, i.e. Postgres.
+- DuckDBBackend runs the same statements on an embedded DuckDB database loaded from a
+  Parquet export of high_schools, count_by_schools with its campuses and races, and
+  hs_populations (export_parquet),
+  for notebooks and batch jobs that should not load the production database. DuckDB is
+  optional, see the "duckdb" extra.
+- snapshot.AnalyticsSnapshot answers them from memory-mapped Arrow files.
+
+    export_parquet("~/hs4uc-export")
+    backend = DuckDBBackend.from_parquet("~/hs4uc-export")
+    backend_school_rate_page(backend, select_campus="all", limit=10**9)
+"""
+
+import logging
+import os
+from abc import ABC, abstractmethod
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Boolean, DateTime, Executable, Float, Integer, select
+from sqlalchemy.dialects.postgresql.base import PGDialect
+from sqlalchemy.orm import Session
+from app.aggregate import (
+    distinct_years_query,
+    school_counts_frame,
+    school_counts_query,
+    school_info_dict,
+    school_info_query,
+)
+from app.analyze_data import campus_counts_query
+from app.database import session_factory
+from app.models import (
+    Campus,
+    CountBySchool,
+    HighSchool,
+    HSPopulation,
+    Race,
+    SchoolYearRollup,
+)
+from app.rollup import rollup_insert
+
+try:
+    import duckdb
+except ImportError:  # optional, see the "duckdb" extra
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+# tables of the Parquet export, one file each
+EXPORT_TABLES = [HighSchool, Campus, Race, CountBySchool, HSPopulation]
+EXPORT_BATCH_SIZE = 50_000
+
+# Postgres SQL with $1, $2, ... parameters, which DuckDB understands
+DUCKDB_DIALECT = PGDialect(paramstyle="numeric_dollar")
+
+
+class SQLBackend(ABC):
+    """
+    Analysis backend running the statements of app.aggregate, subclasses execute them.
+    """
+
+    @abstractmethod
+    def execute(self, stmt: Executable) -> list:
+        pass
+
+    def years(self) -> list[str]:
+        return [year for year, in self.execute(distinct_years_query())]
+
+    def school_counts(
+        self,
+        years: list[str],
+        select_campus: str = "all",
+        select_school_type: str = "all",
+        schools: list[str] | None = None,
+        by_campus: bool = False,
+    ) -> pd.DataFrame:
+        stmt = school_counts_query(
+            years,
+            select_campus=select_campus,
+            select_school_type=select_school_type,
+            schools=schools,
+            by_campus=by_campus,
+        )
+        return school_counts_frame(self.execute(stmt), by_campus=by_campus)
+
+    def school_info(self, schools: list[str]) -> dict:
+        return school_info_dict(self.execute(school_info_query(schools=schools)))
+
+    def campus_counts(self) -> list:
+        return self.execute(campus_counts_query())
+
+
+class SQLAlchemyBackend(SQLBackend):
+    def __init__(self, session: Session):
+        self.session = session
+
+    def execute(self, stmt: Executable) -> list:
+        return self.session.execute(stmt).all()
+
+
+class DuckDBBackend(SQLBackend):
+    def __init__(self, connection):
+        self.connection = connection
+
+    @classmethod
+    def from_parquet(
+        cls, directory: str, database: str = ":memory:"
+    ) -> "DuckDBBackend":
+        """
+        Load the files of export_parquet into a DuckDB database and build its
+        school_year_rollups with the statement of rollup.refresh_rollups.
+
+        :param database, str, path of a DuckDB file to keep the tables, in memory by default
+        """
+        if duckdb is None:
+            raise RuntimeError("duckdb is not installed, poetry install -E duckdb")
+        connection = duckdb.connect(database)
+        backend = cls(connection)
+        for model in EXPORT_TABLES:
+            table = model.__tablename__
+            connection.execute(f"DROP TABLE IF EXISTS {table}")
+            connection.read_parquet(
+                os.path.join(os.path.expanduser(directory), f"{table}.parquet")
+            ).create(table)
+        connection.execute("DROP TABLE IF EXISTS school_year_rollups")
+        connection.execute(
+            "CREATE TABLE school_year_rollups ("
+            + ", ".join(
+                f"{column.name} {column.type.compile(DUCKDB_DIALECT)}"
+                for column in SchoolYearRollup.__table__.columns
+            )
+            + ")"
+        )
+        backend.execute(rollup_insert())
+        return backend
+
+    def execute(self, stmt: Executable) -> list:
+        compiled = stmt.compile(
+            dialect=DUCKDB_DIALECT, compile_kwargs={"render_postcompile": True}
+        )
+        params = [compiled.params[name] for name in compiled.positiontup or []]
+        cursor = self.connection.execute(str(compiled), params)
+        return cursor.fetchall() if cursor.description else []
+
+
+def arrow_type(column) -> pa.DataType:
+    if isinstance(column.type, Integer):
+        return pa.int32()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us", tz="UTC" if column.type.timezone else None)
+    return pa.string()
+
+
+def export_parquet(directory: str) -> list[str]:
+    """
+    Write the EXPORT_TABLES to "<table>.parquet" files in directory, for
+    DuckDBBackend.from_parquet. All from one database snapshot.
+
+    :return list, paths of the files
+    """
+    directory = os.path.expanduser(directory)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    with session_factory() as session:
+        session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        for model in EXPORT_TABLES:
+            table = model.__table__
+            schema = pa.schema(
+                [(column.name, arrow_type(column)) for column in table.columns]
+            )
+            path = os.path.join(directory, f"{table.name}.parquet")
+            result = session.execute(
+                select(table).execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            with pq.ParquetWriter(path, schema) as writer:
+                for rows in result.partitions():
+                    writer.write_table(
+                        pa.table(
+                            [
+                                pa.array(values, field.type)
+                                for values, field in zip(zip(*rows), schema)
+                            ],
+                            schema=schema,
+                        )
+                    )
+            logger.info("Exported %s to %s", table.name, path)
+            paths.append(path)
+    return paths
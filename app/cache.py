@@ -0,0 +1,168 @@
+"""
+in-memory cache of /analyze responses
+
+The data only changes when the importers run, usually from another process. They bump
+the data_versions stamp in the same transaction as their writes, and the cache drops
+all its entries once it sees a new stamp. The stamp is read at most once every
+DATA_VERSION_TTL seconds, so a hit costs no query; an import shows up that much later.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.models import DataVersion
+from app.database import async_session_factory, session_factory
+
+logger = logging.getLogger(__name__)
+
+# responses kept per process, 0 disables the cache
+ANALYZE_CACHE_SIZE = int(os.getenv("ANALYZE_CACHE_SIZE", "256"))
+# total bytes of the responses kept per process, larger responses are not cached
+ANALYZE_CACHE_BYTES = int(os.getenv("ANALYZE_CACHE_BYTES", str(64 * 1024 * 1024)))
+DATA_VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", "5"))
+DATA_VERSION_ID = 1
+
+
+def bump_data_version(session: Session) -> None:
+    """
+    Mark the data as changed. Does not commit, call it in the importer's transaction.
+    """
+    session.execute(
+        pg_insert(DataVersion)
+        .values(id=DATA_VERSION_ID, version=1)
+        .on_conflict_do_update(
+            index_elements=[DataVersion.id],
+            set_={"version": DataVersion.version + 1, "updated_at": func.now()},
+        )
+    )
+
+
+def data_version_query():
+    return select(DataVersion.version).filter(DataVersion.id == DATA_VERSION_ID)
+
+
+def read_data_version() -> int | None:
+    with session_factory() as session:
+        return session.scalar(data_version_query())
+
+
+async def read_data_version_async() -> int | None:
+    async with async_session_factory() as session:
+        return await session.scalar(data_version_query())
+
+
+class ResponseCache:
+    """
+    LRU cache holding at most maxsize encoded responses, of at most maxbytes in total,
+    of the current data version.
+    Thread safe, for routes run in FastAPI's thread pool as well as async ones.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = ANALYZE_CACHE_SIZE,
+        maxbytes: int = ANALYZE_CACHE_BYTES,
+        version_ttl: float = DATA_VERSION_TTL,
+    ):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.version_ttl = version_ttl
+        self.entries = OrderedDict()
+        # total len() of the entries
+        self.size = 0
+        self.version = None
+        self.version_checked_at = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def version_is_due(self) -> bool:
+        return (
+            self.version_checked_at is None
+            or time.monotonic() - self.version_checked_at >= self.version_ttl
+        )
+
+    def set_version(self, version: int | None) -> None:
+        with self.lock:
+            if version != self.version:
+                if self.entries:
+                    logger.info(
+                        "Data version %s -> %s, dropping %d cached responses",
+                        self.version,
+                        version,
+                        len(self.entries),
+                    )
+                self.entries.clear()
+                self.size = 0
+                self.version = version
+            self.version_checked_at = time.monotonic()
+
+    def lookup(self, key: Hashable) -> tuple[bool, bytes | None]:
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, self.entries[key]
+            self.misses += 1
+            return False, None
+
+    def store(self, version: int | None, key: Hashable, response: bytes) -> None:
+        with self.lock:
+            # an import seen while computing may have made the response stale already
+            if self.version != version or len(response) > self.maxbytes:
+                return
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = response
+            self.size += len(response)
+            while len(self.entries) > self.maxsize or self.size > self.maxbytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], bytes]) -> bytes:
+        """
+        The cached response for key, or compute() which is then cached. Responses are
+        shared between requests, callers must not mutate them.
+        """
+        if self.maxsize <= 0:
+            return compute()
+        if self.version_is_due():
+            self.set_version(read_data_version())
+        version = self.version
+        hit, response = self.lookup(key)
+        if not hit:
+            response = compute()
+            self.store(version, key, response)
+        return response
+
+    async def get_or_compute_async(
+        self, key: Hashable, compute: Callable[[], Awaitable[bytes]]
+    ) -> bytes:
+        """
+        get_or_compute for the async routes, compute() is awaited.
+        """
+        if self.maxsize <= 0:
+            return await compute()
+        if self.version_is_due():
+            self.set_version(await read_data_version_async())
+        version = self.version
+        hit, response = self.lookup(key)
+        if not hit:
+            response = await compute()
+            self.store(version, key, response)
+        return response
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            self.version_checked_at = None
+
+
+analyze_cache = ResponseCache()
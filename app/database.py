@@ -3,9 +3,15 @@ func for db connections
 """
 
 import os
+import threading
+import time
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 POSTGRES_USER = os.getenv("POSTGRES_USER", "jie")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "1234")
@@ -13,7 +19,164 @@ POSTGRES_DB = os.getenv("POSTGRES_DB", "hs4uc")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST", "localhost")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT", "5433")
 
+# per engine and per process, every uvicorn worker has its own pools
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ["1", "true"]
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))  # seconds, -1 never
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+    "pool_recycle": DB_POOL_RECYCLE,
+}
+
+# checkouts waiting longer are counted as slow
+SLOW_CHECKOUT_SECONDS = 0.01
+
+
+class PoolMetrics:
+    """
+    Counters of one engine's pool since the process started, see pool_stats.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.slow_checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.peak_checked_out = 0
+        self.connects = 0
+        self.invalidations = 0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if seconds > SLOW_CHECKOUT_SECONDS:
+                self.slow_checkouts += 1
+
+    def snapshot(self, pool: QueuePool) -> dict:
+        with self.lock:
+            checked_out = pool.checkedout()
+            return {
+                "pool_size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": checked_out,
+                "checked_in": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+                "peak_checked_out": self.peak_checked_out,
+                "peak_overflow": max(0, self.peak_checked_out - pool.size()),
+                "checkouts": self.checkouts,
+                "slow_checkouts": self.slow_checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_mean": (
+                    self.wait_seconds_total / self.checkouts * 1000
+                    if self.checkouts
+                    else None
+                ),
+                "wait_ms_max": self.wait_seconds_max * 1000,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+            }
+
+
+class TimedPoolMixin:
+    """
+    Times _do_get, i.e. how long a checkout waited for a free connection (or opened a
+    new one). There is no pool event before a checkout starts waiting.
+    """
+
+    metrics: PoolMetrics | None = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            if self.metrics:
+                self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.metrics:
+            self.metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool, keep counting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+# {name: (engine, metrics)} of the instrumented engines
+instrumented_engines = {}
+
+
+def instrument_pool(engine: Engine, name: str) -> PoolMetrics:
+    """
+    Start collecting metrics of the engine's pool, reported under name by pool_stats.
+    The engine should use one of the Timed pools for checkout wait times.
+    """
+    metrics = PoolMetrics()
+    engine.pool.metrics = metrics
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out = engine.pool.checkedout()
+        with metrics.lock:
+            metrics.peak_checked_out = max(metrics.peak_checked_out, checked_out)
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        with metrics.lock:
+            metrics.connects += 1
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        with metrics.lock:
+            metrics.invalidations += 1
+
+    instrumented_engines[name] = (engine, metrics)
+    return metrics
+
+
+def pool_stats() -> dict:
+    return {
+        name: metrics.snapshot(engine.pool)
+        for name, (engine, metrics) in instrumented_engines.items()
+    }
+
+
 engine = create_engine(
-    f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+    f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}",
+    poolclass=TimedQueuePool,
+    **POOL_OPTIONS,
 )
+instrument_pool(engine, "sync")
 session_factory = sessionmaker(engine)
+
+# used by the async routes in app.main, the importers and scripts stay on psycopg2
+async_engine = create_async_engine(
+    f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}",
+    poolclass=TimedAsyncAdaptedQueuePool,
+    **POOL_OPTIONS,
+)
+instrument_pool(async_engine.sync_engine, "async")
+async_session_factory = async_sessionmaker(async_engine)
@@ -0,0 +1,108 @@
+"""
+streaming exports of the full by_school_rate ranking
+
+One school per line, as NDJSON (the /analyze results of the school, plus its name) or
+CSV (one column per year, campus and metric). The lines are produced while the ranking
+is read from the database, see analyze_data.iter_school_rates.
+"""
+
+import csv
+import io
+import json
+from collections.abc import Iterable, Iterator
+from app.aggregate import RESULT_LAYOUT, analysis_years, distinct_campuses
+from app.analyze_data import iter_school_rates
+from app.database import session_factory
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+SCHOOL_COLUMNS = ["school", "city", "category"]
+
+
+def export_school_rates(
+    export_format: str = "ndjson",
+    select_campus: str = "all",
+    select_year: str | int = "all",
+    select_school_type: str = "all",
+) -> Iterator[str]:
+    """
+    Lines of the export, the session stays open until the last one was produced.
+    """
+    with session_factory() as session:
+        loop_years, sort_by_year = analysis_years(session, select_year)
+        school_rates = iter_school_rates(
+            session,
+            loop_years,
+            sort_by_year,
+            select_campus=select_campus,
+            select_school_type=select_school_type,
+        )
+        if export_format == "csv":
+            campuses = (
+                distinct_campuses(session) if select_campus == "individual" else None
+            )
+            yield from csv_lines(school_rates, csv_columns(loop_years, campuses))
+        else:
+            yield from ndjson_lines(school_rates)
+
+
+def ndjson_lines(school_rates: Iterable[tuple[str, dict]]) -> Iterator[str]:
+    for school, results in school_rates:
+        yield json.dumps({"school": school, **results}) + "\n"
+
+
+def csv_columns(loop_years: list[str], campuses: list[str] | None = None) -> list[str]:
+    """
+    :param campuses, list, columns per campus for select_campus "individual"
+    """
+    columns = list(SCHOOL_COLUMNS)
+    for year in sorted(loop_years, reverse=True):
+        for section, fields in RESULT_LAYOUT.items():
+            if campuses is None or section == "student_demo":
+                columns += [f"{year} {key}" for key, _ in fields]
+        for campus in campuses or []:
+            for section, fields in RESULT_LAYOUT.items():
+                if section != "student_demo":
+                    columns += [f"{year} {campus} {key}" for key, _ in fields]
+    return columns
+
+
+def csv_row(school: str, results: dict) -> dict:
+    school_info = results.get("school_info") or {}
+    row = {
+        "school": school,
+        "city": school_info.get("city"),
+        "category": school_info.get("category"),
+    }
+    for year, year_res in results.items():
+        if year == "school_info":
+            continue
+        for name, values in year_res.items():
+            if name in RESULT_LAYOUT:
+                row.update({f"{year} {key}": value for key, value in values.items()})
+                continue
+            # a campus of select_campus "individual"
+            for section in values.values():
+                row.update(
+                    {f"{year} {name} {key}": value for key, value in section.items()}
+                )
+    return row
+
+
+def csv_lines(
+    school_rates: Iterable[tuple[str, dict]], columns: list[str]
+) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, columns)
+
+    def flush() -> str:
+        lines = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return lines
+
+    writer.writeheader()
+    yield flush()
+    for school, results in school_rates:
+        writer.writerow(csv_row(school, results))
+        yield flush()
@@ -2,11 +2,33 @@
 parse csv and save to db
 """
 
+import contextlib
+import functools
+import hashlib
 import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
 import pandas as pd
-from sqlalchemy import func
-from app.models import CountBySchool, HighSchool, HSPopulation
+import pyarrow as pa
+import pyarrow.feather as feather
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.models import (
+    COUNT_TYPES,
+    Campus,
+    CountBySchool,
+    HighSchool,
+    HSPopulation,
+    Race,
+)
 from app.database import session_factory
+from app.partitions import ensure_year_partitions, replace_year_partition
+from app.rollup import refresh_rollups
+from app.cache import bump_data_version
+from app.snapshot import ANALYTICS_SNAPSHOT_DIR, publish_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -16,8 +38,42 @@ DEFAULT_FILE_PATH = "~/Desktop/admission/admissions_v2.xlsx"
 YEARS = ["2023", "2022", "2021"]
 CAMPUSES = ["ucb", "ucla", "uci", "ucd", "ucsd", "ucsb"]
 
+# processes parsing sheets in parallel, see iter_sheets
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "1"))
+
+# parsed sheets are cached as Arrow files keyed by the workbook content, see
+# sheet_cache_path. Set SHEET_CACHE_DIR to an empty string to always parse the xlsx.
+SHEET_CACHE_DIR = os.getenv("SHEET_CACHE_DIR", "~/.cache/hs4uc/sheets")
+# bump when normalize_sheet changes, so sheets normalized the old way are not reused
+SHEET_CACHE_VERSION = 1
+
 DEFAULT_FILE_PATH_GRAD_STATS = "~/Desktop/admission/hs_graduates.xlsx"
 GRAD_YEARS = ["2023", "2021"]
+# todo/note: two spreadsheets may use different names for the same school.
+SCHOOL_NAME_MAP = {
+    "adrian wilcox high": "ADRIAN C WILCOX HIGH SCHOOL",
+    "andrew p. hill high": "ANDREW P HILL HIGH SCHOOL",
+    "downtown college preparatory": "DOWNTOWN COLG PREP EL PRIMERO",  # uncertain accuracy
+    "downtown college prep - alum rock": "DOWNTOWN COLLEGE PREP ALUM ROC",
+    "dr. tj owens gilroy early college academy": "DR TJ OWENS GILROY EARLY COLG",
+    "henry m. gunn high": "HENRY M GUNN SENIOR HIGH SCHL",
+    "gunderson high": "HENRY T GUNDERSON HIGH SCHOOL",
+    "latino college preparatory academy": "LATINO COLLEGE PREP ACADEMY",
+    "liberty (alternative)": "LIBERTY HIGH SCHOOL",
+    "milpitas middle college high": "MILPITAS MIDDLE COLLEGE HS",
+    "mission early college high": "MISSION EARLY COLLEGE HIGH SCH",
+    "mt. pleasant high": "MOUNT PLEASANT HIGH SCHOOL",
+    "palo alto high": "PALO ALTO SENIOR HIGH SCHOOL",
+    "b. roberto cruz leadership academy": "ROBERTO CRUZ LEADERSHIP ACDMY",
+    "summit public school: denali": "SUMMIT PUBLIC SCHOOL DENALI",
+    "summit public school: tahoma": "SUMMIT PUBLIC SCHOOL-TAHOMA",
+    "university preparatory academy charter": "UNIVERSITY PREP ACADEMY",
+    "william c. overfelt high": "W C OVERFELT HIGH SCHOOL",
+    "wilson alternative": "WILSON HIGH SCHOOL",
+}
+
+# "{yr} {camp}" sheets of the admissions workbook
+ADMISSION_SHEETS = {f"{yr} {camp}": (yr, camp) for yr in YEARS for camp in CAMPUSES}
 
 SHEET_HEADER_TO_TABLE_COLUMNS = {
     "Calculation1": "na",
@@ -28,140 +84,529 @@ SHEET_HEADER_TO_TABLE_COLUMNS = {
 }
 
 
-def read_file_to_list(
-    file_path: str, sheet_name: str | int | None = 0, ffill: bool = True
-) -> list[dict]:
-    raw_df = pd.read_excel(io=file_path, sheet_name=sheet_name, header=0)
+def normalize_sheet(raw_df: pd.DataFrame, ffill: bool = True) -> pd.DataFrame:
     if ffill:
         columns_to_ffill = ["Calculation1", "County/State/ Territory", "School", "City"]
         raw_df[columns_to_ffill] = raw_df[columns_to_ffill].ffill()
     raw_df.fillna(0, inplace=True)
     # pd.set_option("display.max_columns", None)
     # print(f"****** raw_df\n{raw_df}")
+    return raw_df
+
+
+@functools.lru_cache(maxsize=32)
+def workbook_digest(file_path: str, mtime_ns: int, size: int) -> str:
+    # mtime and size are only part of the lru key, so an edited file is hashed again
+    with open(file_path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def sheet_cache_path(
+    file_path: str, sheet_name: str | int, ffill: bool = True
+) -> str | None:
+    """
+    Where the normalized sheet is cached, or None when caching is disabled.
+
+    The key is the sha256 of the workbook content, not its path or mtime, so copying or
+    touching a workbook keeps its cache and replacing it with new numbers does not.
+    """
+    if not SHEET_CACHE_DIR:
+        return None
+    file_path = os.path.expanduser(file_path)
+    stat = os.stat(file_path)
+    key = hashlib.sha256(
+        "|".join(
+            [
+                workbook_digest(file_path, stat.st_mtime_ns, stat.st_size),
+                repr(sheet_name),
+                str(ffill),
+                str(SHEET_CACHE_VERSION),
+            ]
+        ).encode()
+    ).hexdigest()
+    return os.path.join(os.path.expanduser(SHEET_CACHE_DIR), f"{key}.arrow")
+
+
+def load_cached_sheet(cache_path: str | None) -> pd.DataFrame | None:
+    if cache_path is None or not os.path.exists(cache_path):
+        return None
+    return feather.read_table(cache_path, memory_map=True).to_pandas()
+
+
+def store_cached_sheet(cache_path: str | None, sheet_df: pd.DataFrame) -> None:
+    if cache_path is None:
+        return
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # written aside and renamed, so a concurrent reader never maps a partial file
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        # uncompressed, so the columns can be memory mapped instead of decoded
+        feather.write_feather(sheet_df, tmp_path, compression="uncompressed")
+    except (pa.ArrowException, ValueError) as e:
+        # e.g. a column mixing text and the 0 fillna put in its blanks
+        logger.warning("Cannot cache sheet in %s: %s", cache_path, e)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        return
+    os.replace(tmp_path, cache_path)
+
+
+def read_file_to_df(
+    file_path: str, sheet_name: str | int | None = 0, ffill: bool = True
+) -> pd.DataFrame:
+    cache_path = sheet_cache_path(file_path, sheet_name, ffill=ffill)
+    sheet_df = load_cached_sheet(cache_path)
+    if sheet_df is None:
+        raw_df = pd.read_excel(io=file_path, sheet_name=sheet_name, header=0)
+        sheet_df = normalize_sheet(raw_df, ffill=ffill)
+        store_cached_sheet(cache_path, sheet_df)
+    return sheet_df
+
+
+def read_file_to_list(
+    file_path: str, sheet_name: str | int | None = 0, ffill: bool = True
+) -> list[dict]:
+    raw_df = read_file_to_df(file_path=file_path, sheet_name=sheet_name, ffill=ffill)
     records = raw_df.to_dict("records")
     return records
 
 
+def iter_sheets(
+    file_path: str,
+    sheet_names: list[str | int],
+    ffill: bool = True,
+    workers: int = 1,
+) -> Iterator[tuple[str | int, pd.DataFrame]]:
+    """
+    Parse the given sheets and yield them one at a time, in order.
+
+    With one worker, the workbook is opened once: reading each sheet with pd.read_excel
+    would load the workbook (shared strings, styles, ...) again for every sheet, while
+    openpyxl's read only mode streams each sheet.
+
+    With more workers, sheets are parsed in a process pool, each task opening the workbook
+    for its own sheet. At most two sheets per worker are parsed ahead of the consumer,
+    and they are still yielded in the given order, so a single writer gets the same
+    sequence either way.
+
+    Either way, sheets found in the SHEET_CACHE_DIR cache are memory mapped from there
+    instead, and the workbook is only opened for the others.
+    """
+    if workers <= 1:
+        with contextlib.ExitStack() as stack:
+            workbook = None
+            for sheet_name in sheet_names:
+                cache_path = sheet_cache_path(file_path, sheet_name, ffill=ffill)
+                sheet_df = load_cached_sheet(cache_path)
+                if sheet_df is None:
+                    if workbook is None:
+                        workbook = stack.enter_context(
+                            pd.ExcelFile(file_path, engine="openpyxl")
+                        )
+                    raw_df = workbook.parse(sheet_name=sheet_name, header=0)
+                    sheet_df = normalize_sheet(raw_df, ffill=ffill)
+                    store_cached_sheet(cache_path, sheet_df)
+                yield sheet_name, sheet_df
+        return
+
+    remaining = iter(sheet_names)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+
+        def submit_next() -> None:
+            sheet_name = next(remaining, None)
+            if sheet_name is not None:
+                future = executor.submit(read_file_to_df, file_path, sheet_name, ffill)
+                pending.append((sheet_name, future))
+
+        try:
+            for _ in range(workers * 2):
+                submit_next()
+            while pending:
+                sheet_name, future = pending.popleft()
+                submit_next()
+                yield sheet_name, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
 def save_file_to_db(
-    file_path: str = DEFAULT_FILE_PATH, school_category: str = "public"
+    file_path: str = DEFAULT_FILE_PATH,
+    school_category: str = "public",
+    workers: int = IMPORT_WORKERS,
 ) -> dict:
     results = {}
     with session_factory() as session:
-        for yr in YEARS:
-            for camp in CAMPUSES:
-                sheet_name = f"{yr} {camp}"
-                records = read_file_to_list(file_path=file_path, sheet_name=sheet_name)
-                new_saved = 0
-                existing_count = 0
-                for rec in records:
-                    # match schools
-                    school_id = None
-                    found_school = (
-                        session.query(HighSchool.id)
-                        .filter(
-                            HighSchool.city == rec.get("City"),
-                            HighSchool.name == rec.get("School"),
-                        )
-                        .first()
+        for sheet_name, sheet_df in iter_sheets(
+            file_path, list(ADMISSION_SHEETS), workers=workers
+        ):
+            yr, camp = ADMISSION_SHEETS[sheet_name]
+            records = sheet_df.to_dict("records")
+            races = [
+                _
+                for _ in sheet_df.columns
+                if SHEET_HEADER_TO_TABLE_COLUMNS.get(_) is None
+            ]
+            campus_id = dimension_ids(session, Campus, [camp])[camp]
+            race_ids = dimension_ids(session, Race, races)
+            ensure_year_partitions(session, [yr])
+            session.commit()
+            new_saved = 0
+            existing_count = 0
+            touched_school_ids = set()
+            for rec in records:
+                # match schools
+                school_id = None
+                found_school = (
+                    session.query(HighSchool.id)
+                    .filter(
+                        HighSchool.city == rec.get("City"),
+                        HighSchool.name == rec.get("School"),
                     )
-                    if found_school:
-                        school_id = found_school.id
-                    else:
-                        new_school = HighSchool(
-                            city=rec.get("City"),
-                            name=rec.get("School"),
-                            category=school_category,
+                    .first()
+                )
+                if found_school:
+                    school_id = found_school.id
+                else:
+                    new_school = HighSchool(
+                        city=rec.get("City"),
+                        name=rec.get("School"),
+                        category=school_category,
+                    )
+                    session.add(new_school)
+                    session.commit()
+                    session.refresh(new_school)
+                    school_id = new_school.id
+                    print(f"Created new school {new_school.name}({new_school.id})")
+                touched_school_ids.add(school_id)
+
+                for race in races:
+                    try:
+                        # natural key, see uq_count_by_schools_natural_key
+                        existing = (
+                            session.query(CountBySchool)
+                            .filter(
+                                CountBySchool.school_id == school_id,
+                                CountBySchool.year == int(yr),
+                                CountBySchool.campus_id == campus_id,
+                                CountBySchool.race_id == race_ids[race],
+                                CountBySchool.count_type == rec.get("Count"),
+                            )
+                            .first()
                         )
-                        session.add(new_school)
-                        session.commit()
-                        session.refresh(new_school)
-                        school_id = new_school.id
-                        print(f"Created new school {new_school.name}({new_school.id})")
-
-                    races = [
-                        _
-                        for _ in rec.keys()
-                        if SHEET_HEADER_TO_TABLE_COLUMNS.get(_) is None
-                    ]
-                    for race in races:
-                        try:
-                            existing = (
-                                session.query(CountBySchool.id)
-                                .filter(
-                                    CountBySchool.year == yr,
-                                    CountBySchool.campus == camp,
-                                    CountBySchool.race == race,
-                                    CountBySchool.count_type == rec.get("Count"),
-                                    CountBySchool.count == rec.get(race, 0),
-                                    CountBySchool.city == rec.get("City"),
-                                    CountBySchool.school == rec.get("School"),
-                                )
-                                .first()
+                        if existing is None:
+                            new_obj = CountBySchool(
+                                school_id=school_id,
+                                year=int(yr),
+                                campus_id=campus_id,
+                                race_id=race_ids[race],
+                                count_type=rec.get("Count"),
+                                count=rec.get(race, 0),
                             )
-                            if existing is None:
-                                new_obj = CountBySchool(
-                                    year=yr,
-                                    campus=camp,
-                                    race=race,
-                                    count_type=rec.get("Count"),
-                                    count=rec.get(race, 0),
-                                    city=rec.get("City"),
-                                    school=rec.get("School"),
-                                    school_id=school_id,
-                                )
-                                session.add(new_obj)
-                                new_saved += 1
-                            else:
-                                if existing.school_id is None:
-                                    existing.school_id = school_id
-                                existing_count += 1
-                            session.commit()
-                        except Exception as e:
-                            logger.error(e)
-                            session.rollback()
-
-                results[sheet_name] = {
-                    "new_saved": new_saved,
-                    "existing": existing_count,
-                }
+                            session.add(new_obj)
+                            new_saved += 1
+                        else:
+                            existing.count = rec.get(race, 0)
+                            existing_count += 1
+                        session.commit()
+                    except Exception as e:
+                        logger.error(e)
+                        session.rollback()
 
+            refresh_rollups(
+                session,
+                school_ids=list(touched_school_ids),
+                years=[yr],
+                campuses=[camp],
+            )
+            bump_data_version(session)
+            session.commit()
+
+            results[sheet_name] = {
+                "new_saved": new_saved,
+                "existing": existing_count,
+            }
+
+    if ANALYTICS_SNAPSHOT_DIR:
+        publish_snapshot()
+    return results
+
+
+def dimension_ids(session: Session, model, names: list[str]) -> dict:
+    """
+    Create the missing rows of a dimension table (Campus, Race) and look up the ids of
+    all the names in one query.
+
+    :return dict, {name: id}
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    session.execute(
+        pg_insert(model).on_conflict_do_nothing(index_elements=["name"]),
+        [{"name": name} for name in names],
+    )
+    found = session.execute(select(model.name, model.id).filter(model.name.in_(names)))
+    return dict(found.all())
+
+
+def resolve_school_ids(
+    session: Session, schools: pd.DataFrame, school_category: str = "public"
+) -> dict:
+    """
+    Create the missing schools and look up the ids of all of them in one query.
+
+    :param schools, DataFrame, with "City" and "School" columns
+    :return dict, {(city, name): school id}
+    """
+    pairs = list(
+        schools[["City", "School"]].drop_duplicates().itertuples(index=False, name=None)
+    )
+    if not pairs:
+        return {}
+    session.execute(
+        pg_insert(HighSchool).on_conflict_do_nothing(
+            constraint="uq_high_schools_city_name"
+        ),
+        [
+            {"city": city, "name": name, "category": school_category}
+            for city, name in pairs
+        ],
+    )
+    found = session.execute(
+        select(HighSchool.city, HighSchool.name, HighSchool.id).filter(
+            tuple_(HighSchool.city, HighSchool.name).in_(pairs)
+        )
+    )
+    return {(city, name): school_id for city, name, school_id in found}
+
+
+def sheet_count_rows(
+    session: Session,
+    sheet_df: pd.DataFrame,
+    year: str,
+    campus: str,
+    school_category: str = "public",
+) -> tuple[list[dict], int]:
+    """
+    The count_by_schools rows of one "{yr} {camp}" sheet, one per school, count type and
+    race column. Creates the missing schools, campuses and races. Does not commit.
+
+    :return tuple, (rows, number of repeated sheet rows left out)
+    """
+    school_ids = resolve_school_ids(session, sheet_df, school_category)
+
+    races = [
+        _ for _ in sheet_df.columns if SHEET_HEADER_TO_TABLE_COLUMNS.get(_) is None
+    ]
+    counts_df = sheet_df.melt(
+        id_vars=["School", "City", "Count"],
+        value_vars=races,
+        var_name="race",
+        value_name="count",
+    )
+    counts_df["count"] = pd.to_numeric(counts_df["count"], errors="coerce")
+    invalid = counts_df["count"].isna() | ~counts_df["Count"].isin(COUNT_TYPES)
+    if invalid.any():
+        logger.error(
+            "Skip %s non numeric counts or unknown count types in %s %s: %s",
+            invalid.sum(),
+            year,
+            campus,
+            counts_df[invalid].head().to_dict("records"),
+        )
+        counts_df = counts_df[~invalid]
+    # a repeated row updates the earlier one, as in save_file_to_db
+    natural_key = ["School", "City", "Count", "race"]
+    repeated = int(counts_df.duplicated(subset=natural_key).sum())
+    counts_df = counts_df.drop_duplicates(subset=natural_key, keep="last")
+
+    campus_id = dimension_ids(session, Campus, [campus])[campus]
+    race_ids = dimension_ids(session, Race, races)
+    rows = [
+        {
+            "school_id": school_ids[(city, school)],
+            "year": int(year),
+            "campus_id": campus_id,
+            "race_id": race_ids[race],
+            "count_type": count_type,
+            "count": int(count),
+        }
+        for school, city, count_type, race, count in counts_df.itertuples(
+            index=False, name=None
+        )
+    ]
+    return rows, repeated
+
+
+def bulk_save_sheet_to_db(
+    session: Session,
+    sheet_df: pd.DataFrame,
+    year: str,
+    campus: str,
+    school_category: str = "public",
+) -> dict:
+    """
+    Upsert one "{yr} {camp}" sheet into count_by_schools with batched INSERT ... ON CONFLICT
+    on the natural key, and refresh its rollup rows. Does not commit.
+
+    :return dict, {"new_saved", "existing"} like save_file_to_db
+    """
+    rows, repeated = sheet_count_rows(session, sheet_df, year, campus, school_category)
+    if not rows:
+        return {"new_saved": 0, "existing": 0}
+
+    ensure_year_partitions(session, [year])
+    # xmax, which tells inserted from updated rows, is not available on a partitioned
+    # table. The sheet is one year and campus, look up which of its keys exist first
+    existing_keys = set(
+        session.execute(
+            select(
+                CountBySchool.school_id, CountBySchool.race_id, CountBySchool.count_type
+            ).filter(
+                CountBySchool.year == int(year),
+                CountBySchool.campus_id == rows[0]["campus_id"],
+            )
+        ).all()
+    )
+    existing = sum(
+        (_["school_id"], _["race_id"], _["count_type"]) in existing_keys for _ in rows
+    )
+    upsert = pg_insert(CountBySchool)
+    upsert = upsert.on_conflict_do_update(
+        constraint="uq_count_by_schools_natural_key",
+        set_={"count": upsert.excluded.count},
+    )
+    session.execute(upsert, rows)
+
+    refresh_rollups(
+        session,
+        school_ids=list({_["school_id"] for _ in rows}),
+        years=[year],
+        campuses=[campus],
+    )
+    bump_data_version(session)
+    return {"new_saved": len(rows) - existing, "existing": existing + repeated}
+
+
+def bulk_save_file_to_db(
+    file_path: str = DEFAULT_FILE_PATH,
+    school_category: str = "public",
+    workers: int = IMPORT_WORKERS,
+) -> dict:
+    """
+    Same as save_file_to_db, with set-based school lookups and batched upserts,
+    one transaction per sheet.
+    """
+    results = {}
+    with session_factory() as session:
+        for sheet_name, sheet_df in iter_sheets(
+            file_path, list(ADMISSION_SHEETS), workers=workers
+        ):
+            yr, camp = ADMISSION_SHEETS[sheet_name]
+            try:
+                results[sheet_name] = bulk_save_sheet_to_db(
+                    session, sheet_df, yr, camp, school_category
+                )
+                session.commit()
+            except Exception as e:
+                logger.error("Failed to import sheet %s: %s", sheet_name, e)
+                session.rollback()
+                results[sheet_name] = {"new_saved": 0, "existing": 0, "error": 1}
+
+    if ANALYTICS_SNAPSHOT_DIR:
+        publish_snapshot()
+    return results
+
+
+def replace_year_from_file(
+    year: str,
+    file_path: str = DEFAULT_FILE_PATH,
+    school_category: str = "public",
+    workers: int = IMPORT_WORKERS,
+) -> dict:
+    """
+    Replace all counts of a year with the "{year} {camp}" sheets of the workbook, in one
+    transaction. The year's partition is swapped for a new one (see
+    partitions.replace_year_partition), counts of that year missing from the sheets are
+    gone afterwards.
+
+    :return dict, {sheet name: {"new_saved"}}
+    """
+    sheet_names = [_ for _, (yr, camp) in ADMISSION_SHEETS.items() if yr == year]
+    results = {}
+    rows = []
+    with session_factory() as session:
+        for sheet_name, sheet_df in iter_sheets(
+            file_path, sheet_names, workers=workers
+        ):
+            yr, camp = ADMISSION_SHEETS[sheet_name]
+            sheet_rows, _ = sheet_count_rows(
+                session, sheet_df, yr, camp, school_category
+            )
+            rows.extend(sheet_rows)
+            results[sheet_name] = {"new_saved": len(sheet_rows)}
+        replace_year_partition(session, year, rows)
+        refresh_rollups(session, years=[year])
+        bump_data_version(session)
+        session.commit()
+
+    if ANALYTICS_SNAPSHOT_DIR:
+        publish_snapshot()
     return results
 
 
-def save_grad_population_to_db(file_path: str = DEFAULT_FILE_PATH_GRAD_STATS) -> dict:
+class SchoolResolver:
+    """
+    Match CDE school names to high_schools ids without a query per row.
+
+    high_schools is loaded once into an index keyed by the lowercase name. A CDE name
+    matches a school with the same name, the same name plus " school", or its alias in
+    SCHOOL_NAME_MAP, in that order. Names matching nothing are kept in unmatched.
+    """
+
+    def __init__(self, session: Session, aliases: dict = SCHOOL_NAME_MAP):
+        self.aliases = {name: alias.lower() for name, alias in aliases.items()}
+        self.ids_by_name = {}
+        for school_id, name in session.execute(
+            select(HighSchool.id, HighSchool.name).order_by(HighSchool.id)
+        ):
+            if name:
+                self.ids_by_name.setdefault(name.lower(), school_id)
+        self.unmatched = set()
+
+    def resolve(self, school_name: str) -> int | None:
+        school_name = school_name.strip().lower()
+        for candidate in [
+            school_name,
+            school_name + " school",
+            self.aliases.get(school_name),
+        ]:
+            school_id = self.ids_by_name.get(candidate)
+            if school_id is not None:
+                return school_id
+        self.unmatched.add(school_name)
+        return None
+
+
+def save_grad_population_to_db(
+    file_path: str = DEFAULT_FILE_PATH_GRAD_STATS, workers: int = IMPORT_WORKERS
+) -> dict:
     race_shortname_map = {
         "ALL": "All",
         "AS": "Asian",
         "FI": {"sub": "Filipino", "main": "Asian"},
     }
-    # todo/note: two spreadsheets may use different names for the same school.
-    school_name_map = {
-        "adrian wilcox high": "ADRIAN C WILCOX HIGH SCHOOL",
-        "andrew p. hill high": "ANDREW P HILL HIGH SCHOOL",
-        "downtown college preparatory": "DOWNTOWN COLG PREP EL PRIMERO",  # uncertain accuracy
-        "downtown college prep - alum rock": "DOWNTOWN COLLEGE PREP ALUM ROC",
-        "dr. tj owens gilroy early college academy": "DR TJ OWENS GILROY EARLY COLG",
-        "henry m. gunn high": "HENRY M GUNN SENIOR HIGH SCHL",
-        "gunderson high": "HENRY T GUNDERSON HIGH SCHOOL",
-        "latino college preparatory academy": "LATINO COLLEGE PREP ACADEMY",
-        "liberty (alternative)": "LIBERTY HIGH SCHOOL",
-        "milpitas middle college high": "MILPITAS MIDDLE COLLEGE HS",
-        "mission early college high": "MISSION EARLY COLLEGE HIGH SCH",
-        "mt. pleasant high": "MOUNT PLEASANT HIGH SCHOOL",
-        "palo alto high": "PALO ALTO SENIOR HIGH SCHOOL",
-        "b. roberto cruz leadership academy": "ROBERTO CRUZ LEADERSHIP ACDMY",
-        "summit public school: denali": "SUMMIT PUBLIC SCHOOL DENALI",
-        "summit public school: tahoma": "SUMMIT PUBLIC SCHOOL-TAHOMA",
-        "university preparatory academy charter": "UNIVERSITY PREP ACADEMY",
-        "william c. overfelt high": "W C OVERFELT HIGH SCHOOL",
-        "wilson alternative": "WILSON HIGH SCHOOL",
-    }
     results = {"new_saved": 0, "updated": 0, "existing_unchanged": 0, "error": 0}
+    touched_school_ids = set()
+    touched_years = set()
     with session_factory() as session:
-        for year in GRAD_YEARS:
-            records = read_file_to_list(
-                file_path=file_path, sheet_name=year, ffill=False
-            )
+        resolver = SchoolResolver(session)
+        for year, sheet_df in iter_sheets(
+            file_path, GRAD_YEARS, ffill=False, workers=workers
+        ):
+            records = sheet_df.to_dict("records")
             for rec in records:
                 # only check school data
                 if rec["rtype"].lower() != "s":
@@ -175,19 +620,8 @@ def save_grad_population_to_db(file_path: str = DEFAULT_FILE_PATH_GRAD_STATS) ->
                 if rec["studentgroup"] not in race_shortname_map:
                     continue
                 try:
-                    school_name = rec["schoolname"].strip().lower()
-                    school_name_2 = school_name + " " + "school"
-                    school_name_3 = school_name_map.get(school_name)
-                    school_names = [school_name, school_name_2]
-                    if school_name_3:
-                        school_names.append(school_name_3.lower())
-                    found_school = (
-                        session.query(HighSchool.id)
-                        .filter(func.lower(HighSchool.name).in_(school_names))
-                        .first()
-                    )
-                    if not found_school:
-                        print(f"Cannot find school {school_name}, skip importing.")
+                    school_id = resolver.resolve(rec["schoolname"])
+                    if school_id is None:
                         continue
 
                     race = race_shortname_map[rec["studentgroup"]]
@@ -196,11 +630,13 @@ def save_grad_population_to_db(file_path: str = DEFAULT_FILE_PATH_GRAD_STATS) ->
                         race = race_shortname_map[rec["studentgroup"]].get("main")
                         sub_race = race_shortname_map[rec["studentgroup"]].get("sub")
                     count = rec["currdenom"]
+                    touched_school_ids.add(school_id)
+                    touched_years.update([year, str(int(year) - 1)])
                     # check if already imported the population object
                     found_population = (
-                        session.query(HSPopulation.id, HSPopulation.count)
+                        session.query(HSPopulation)
                         .filter(
-                            HSPopulation.school_id == found_school.id,
+                            HSPopulation.school_id == school_id,
                             HSPopulation.race == race,
                             HSPopulation.sub_race == sub_race,
                             HSPopulation.year == year,
@@ -217,7 +653,7 @@ def save_grad_population_to_db(file_path: str = DEFAULT_FILE_PATH_GRAD_STATS) ->
                     else:
                         # add new obj
                         new_poulation = HSPopulation(
-                            school_id=found_school.id,
+                            school_id=school_id,
                             race=race,
                             sub_race=sub_race,
                             year=year,
@@ -233,9 +669,9 @@ def save_grad_population_to_db(file_path: str = DEFAULT_FILE_PATH_GRAD_STATS) ->
                     last_year_count = rec.get("priordenom")
                     if last_year_count is not None:
                         found_last_population = (
-                            session.query(HSPopulation.id, HSPopulation.count)
+                            session.query(HSPopulation)
                             .filter(
-                                HSPopulation.school_id == found_school.id,
+                                HSPopulation.school_id == school_id,
                                 HSPopulation.race == race,
                                 HSPopulation.sub_race == sub_race,
                                 HSPopulation.year == last_year,
@@ -252,7 +688,7 @@ def save_grad_population_to_db(file_path: str = DEFAULT_FILE_PATH_GRAD_STATS) ->
                         else:
                             # add new obj
                             new_last_poulation = HSPopulation(
-                                school_id=found_school.id,
+                                school_id=school_id,
                                 race=race,
                                 sub_race=sub_race,
                                 year=last_year,
@@ -267,4 +703,18 @@ def save_grad_population_to_db(file_path: str = DEFAULT_FILE_PATH_GRAD_STATS) ->
                     session.rollback()
                     results["error"] += 1
 
+        # denominators are copied into the rollup rows of the same school and year
+        refresh_rollups(
+            session,
+            school_ids=list(touched_school_ids),
+            years=list(touched_years),
+        )
+        bump_data_version(session)
+        session.commit()
+
+    if ANALYTICS_SNAPSHOT_DIR:
+        publish_snapshot()
+    for school_name in sorted(resolver.unmatched):
+        print(f"Cannot find school {school_name}, skip importing.")
+    results["unmatched"] = sorted(resolver.unmatched)
     return results
@@ -0,0 +1,49 @@
+"""
+logging for the api process
+
+Records of the app.* loggers are put on a queue by a QueueHandler, a QueueListener
+thread formats them and writes them to stderr, so request handlers never wait on the
+stream. Messages use %-style arguments, which are only formatted for enabled levels.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+listener = None
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread too. The queue is in
+    process, so the record is passed as is; log arguments must not be mutated after
+    the logging call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(level: str = LOG_LEVEL) -> logging.handlers.QueueListener:
+    global listener
+    if listener is not None:
+        return listener
+
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(level)
+    app_logger.addHandler(DeferredQueueHandler(log_queue))
+    app_logger.propagate = False
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
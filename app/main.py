@@ -1,6 +1,28 @@
-from fastapi import FastAPI
+import os
+from typing import Annotated, Literal
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from app.analyze_data import by_campus_rate, by_school_rate
+from fastapi.responses import StreamingResponse
+from app.analyze_data import (
+    by_campus_rate_async,
+    by_school_rate_async,
+    by_school_rate_keyset_async,
+    decode_cursor,
+)
+from app.cache import analyze_cache
+from app.database import async_engine, engine, pool_stats
+from app.export import EXPORT_FORMATS, export_school_rates
+from app.responses import EncodedJSONResponse, encode_json_async
+from app.request_stats import RequestStatsMiddleware, instrument_queries
+from app.logging_setup import setup_logging
+from app.schemas import CampusRates, KeysetPage, SchoolRates
+from app.snapshot import (
+    ANALYTICS_SNAPSHOT_DIR,
+    snapshot_campus_rates_async,
+    snapshot_school_rates_async,
+)
+
+setup_logging()
 
 app = FastAPI()
 
@@ -15,6 +37,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestStatsMiddleware)
+instrument_queries(engine)
+instrument_queries(async_engine.sync_engine)
 
 
 @app.get("/health")
@@ -22,22 +47,97 @@ def health_check():
     return {"Hello": "World"}
 
 
-@app.get("/analyze")
-def analyze_data(
+@app.get("/internal/metrics", include_in_schema=False)
+def internal_metrics():
+    # per uvicorn worker, pid tells the workers apart
+    return {"pid": os.getpid(), "pools": pool_stats()}
+
+
+@app.get(
+    "/analyze",
+    response_class=EncodedJSONResponse,
+    responses={200: {"model": CampusRates | SchoolRates | KeysetPage}},
+)
+async def analyze_data(
     by: str = "school",
     select_campus: str = "all",
     select_year: str = "all",
     select_school_type: str = "all",
-    page: int = 1,
-    page_size: int = 10,
+    page: Annotated[int, Query(ge=1)] = 1,
+    page_size: Annotated[int, Query(ge=1)] = 10,
+    cursor: str | None = None,
 ):
     if by == "campus":
-        return by_campus_rate()
-
-    return by_school_rate(
-        select_campus=select_campus,
-        select_year=select_year,
-        select_school_type=select_school_type,
-        offset=(page - 1) * page_size,
-        limit=page_size,
+        campus_rates = (
+            snapshot_campus_rates_async
+            if ANALYTICS_SNAPSHOT_DIR
+            else by_campus_rate_async
+        )
+        body = await analyze_cache.get_or_compute_async(
+            ("campus",), lambda: encode_json_async(campus_rates())
+        )
+        return EncodedJSONResponse(body)
+
+    if cursor is not None:
+        # keyset pagination, an empty cursor for the first page, then next_cursor
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        body = await analyze_cache.get_or_compute_async(
+            (
+                "school_cursor",
+                select_campus,
+                select_year,
+                select_school_type,
+                cursor,
+                page_size,
+            ),
+            lambda: encode_json_async(
+                by_school_rate_keyset_async(
+                    select_campus=select_campus,
+                    select_year=select_year,
+                    select_school_type=select_school_type,
+                    after=after,
+                    limit=page_size,
+                )
+            ),
+        )
+        return EncodedJSONResponse(body)
+
+    school_rates = (
+        snapshot_school_rates_async if ANALYTICS_SNAPSHOT_DIR else by_school_rate_async
+    )
+    body = await analyze_cache.get_or_compute_async(
+        ("school", select_campus, select_year, select_school_type, page, page_size),
+        lambda: encode_json_async(
+            school_rates(
+                select_campus=select_campus,
+                select_year=select_year,
+                select_school_type=select_school_type,
+                offset=(page - 1) * page_size,
+                limit=page_size,
+            )
+        ),
+    )
+    return EncodedJSONResponse(body)
+
+
+@app.get("/analyze/export")
+async def export_analysis(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    select_campus: str = "all",
+    select_year: str = "all",
+    select_school_type: str = "all",
+):
+    # every school in rank order, streamed while it is read from the database
+    return StreamingResponse(
+        export_school_rates(
+            export_format=format,
+            select_campus=select_campus,
+            select_year=select_year,
+            select_school_type=select_school_type,
+        ),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="schools.{format}"'},
     )
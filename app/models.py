@@ -3,7 +3,17 @@ db models
 """
 
 from datetime import datetime
-from sqlalchemy import String, Integer, DateTime, Float, ForeignKey
+from sqlalchemy import (
+    String,
+    Integer,
+    SmallInteger,
+    Enum,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    UniqueConstraint,
+)
 from sqlalchemy.sql import func
 from sqlalchemy.orm import DeclarativeBase, relationship
 from sqlalchemy.orm import Mapped
@@ -16,6 +26,15 @@ class Base(DeclarativeBase):
 
 class HighSchool(Base):
     __tablename__ = "high_schools"
+    __table_args__ = (
+        # importers match schools by city and name
+        UniqueConstraint(
+            "city",
+            "name",
+            name="uq_high_schools_city_name",
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     city: Mapped[str] = mapped_column(String(50), nullable=True)
@@ -41,12 +60,10 @@ class HighSchool(Base):
     admission_counts = relationship("CountBySchool", back_populates="school_obj")
 
     @property
-    def population(self):
-        # latest population
-        if self.populations:
-            pop_list = [_.asdict() for _ in self.populations]
-            return sorted(pop_list, key=lambda x: int(x["year"]), reverse=True)[0]
-        return None
+    def population(self) -> dict | None:
+        # latest 12th grade enrollment, loads all populations of the school. For many
+        # schools use aggregate.load_latest_populations, one statement for all of them
+        return latest_population(self.populations)
 
 
 class HSPopulation(Base):
@@ -55,6 +72,24 @@ class HSPopulation(Base):
     """
 
     __tablename__ = "hs_populations"
+    __table_args__ = (
+        UniqueConstraint(
+            "school_id",
+            "year",
+            "race",
+            "sub_race",
+            "count_type",
+            name="uq_hs_populations_natural_key",
+            postgresql_nulls_not_distinct=True,
+        ),
+        Index(
+            "ix_hs_populations_count_type_year_race",
+            "count_type",
+            "year",
+            "race",
+            postgresql_include=["school_id", "sub_race", "count"],
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     year: Mapped[str] = mapped_column(String(10))
@@ -71,21 +106,126 @@ class HSPopulation(Base):
     school: Mapped["HighSchool"] = relationship(back_populates="populations")
 
 
+def latest_population(populations: list["HSPopulation"]) -> dict | None:
+    """
+    12th grade enrollment of the most recent year among populations, without sub races.
+
+    :return dict, {"year", "counts": {race: count}}, None without enrollment rows
+    """
+    enrollments = [
+        _ for _ in populations if _.count_type == "hs_enr" and _.sub_race is None
+    ]
+    if not enrollments:
+        return None
+    latest_year = max(enrollments, key=lambda x: int(x.year)).year
+    return {
+        "year": latest_year,
+        "counts": {_.race: _.count for _ in enrollments if _.year == latest_year},
+    }
+
+
+# the "Count" column of the admissions sheets
+COUNT_TYPES = ["App", "Adm", "Enr"]
+
+
+class Campus(Base):
+    __tablename__ = "campuses"
+
+    id: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    name: Mapped[str] = mapped_column(String(30), unique=True)  # e.g. "ucla"
+
+
+class Race(Base):
+    __tablename__ = "races"
+
+    id: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    name: Mapped[str] = mapped_column(String(50), unique=True)  # a sheet race column
+
+
 class CountBySchool(Base):
     """
     From https://www.universityofcalifornia.edu/about-us/information-center/admissions-source-school
+
+    The school, campus and race are ids and the year a small integer, so the rows stay
+    narrow. Columns are ordered widest first so Postgres pads nothing between them.
+
+    Partitioned by year, one partition per admission year, see app.partitions.
     """
 
     __tablename__ = "count_by_schools"
+    __table_args__ = (
+        # one count per sheet row and race column, see import_data.save_file_to_db.
+        # Leading with school_id, year, campus_id it also serves rollup.refresh_rollups
+        UniqueConstraint(
+            "school_id",
+            "year",
+            "campus_id",
+            "race_id",
+            "count_type",
+            name="uq_count_by_schools_natural_key",
+        ),
+        {"postgresql_partition_by": "LIST (year)"},
+    )
 
-    id: Mapped[int] = mapped_column(primary_key=True)
-    city: Mapped[str] = mapped_column(String(50))
-    school: Mapped[str] = mapped_column(String(100))
-    race: Mapped[str] = mapped_column(String(50))
-    count_type: Mapped[str] = mapped_column(String(30))
+    # keys of a partitioned table include the partition key
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    school_id: Mapped[int] = mapped_column(ForeignKey("high_schools.id"))
     count: Mapped[int] = mapped_column(Integer)
-    year: Mapped[str] = mapped_column(String(10))
-    campus: Mapped[str] = mapped_column(String(30))
+    count_type: Mapped[str] = mapped_column(
+        Enum(*COUNT_TYPES, name="admission_count_type")
+    )
+    year: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    campus_id: Mapped[int] = mapped_column(SmallInteger, ForeignKey("campuses.id"))
+    race_id: Mapped[int] = mapped_column(SmallInteger, ForeignKey("races.id"))
 
-    school_id: Mapped[int] = mapped_column(ForeignKey("high_schools.id"), nullable=True)
     school_obj: Mapped[HighSchool] = relationship(back_populates="admission_counts")
+    campus: Mapped[Campus] = relationship()
+    race: Mapped[Race] = relationship()
+
+
+class SchoolYearRollup(Base):
+    """
+    count_by_schools summed per school, year, campus and race, next to the school's
+    12th grade enrollment for that year and race. Maintained by app.rollup.refresh_rollups.
+    """
+
+    __tablename__ = "school_year_rollups"
+    __table_args__ = (
+        Index(
+            "ix_school_year_rollups_year_race_campus",
+            "year",
+            "race",
+            "campus",
+        ),
+    )
+
+    school_id: Mapped[int] = mapped_column(
+        ForeignKey("high_schools.id"), primary_key=True
+    )
+    year: Mapped[str] = mapped_column(String(10), primary_key=True)
+    campus: Mapped[str] = mapped_column(String(30), primary_key=True)
+    race: Mapped[str] = mapped_column(String(50), primary_key=True)
+    app_count: Mapped[int] = mapped_column(Integer, nullable=True)
+    adm_count: Mapped[int] = mapped_column(Integer, nullable=True)
+    enr_count: Mapped[int] = mapped_column(Integer, nullable=True)
+    student_count: Mapped[int] = mapped_column(
+        Integer, nullable=True
+    )  # hs_populations hs_enr count, no sub race
+
+
+class DataVersion(Base):
+    """
+    Single row stamp the importers bump whenever they change the data, so cached
+    /analyze responses know they are stale. See app.cache.
+    """
+
+    __tablename__ = "data_versions"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=True,
+    )
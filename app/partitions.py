@@ -0,0 +1,123 @@
+"""
+maintain the year partitions of count_by_schools
+
+count_by_schools is partitioned by LIST (year), one partition "count_by_schools_<year>"
+per admission year, so statements filtering by year (rollup.refresh_rollups) only read
+the partitions of those years. Importers create the partition of a new year before
+loading it. replace_year_partition loads a whole year into a new table and swaps it in
+for the year's partition, instead of deleting and upserting its rows one by one.
+"""
+
+import csv
+import io
+import logging
+import re
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.models import CountBySchool
+
+logger = logging.getLogger(__name__)
+
+PARENT = CountBySchool.__tablename__
+# the partitions, and the tables replace_year_partition loads
+PARTITION_NAME = re.compile(rf"{PARENT}_\d+(_new)?")
+
+
+def partition_name(year: str | int) -> str:
+    return f"{PARENT}_{int(year)}"
+
+
+def year_partitions(session: Session) -> list[str]:
+    return session.scalars(
+        text(
+            "SELECT inhrelid::regclass::text FROM pg_inherits "
+            f"WHERE inhparent = '{PARENT}'::regclass"
+        )
+    ).all()
+
+
+def ensure_year_partitions(session: Session, years: list[str | int]) -> None:
+    """
+    Create the missing partitions of the given years. Does not commit.
+    """
+    existing = set(year_partitions(session))
+    for year in sorted({int(_) for _ in years}):
+        if partition_name(year) not in existing:
+            session.execute(
+                text(
+                    f"CREATE TABLE {partition_name(year)} "
+                    f"PARTITION OF {PARENT} FOR VALUES IN ({year})"
+                )
+            )
+            logger.info("Created partition %s", partition_name(year))
+
+
+def replace_year_partition(session: Session, year: str | int, rows: list[dict]) -> int:
+    """
+    Replace all count_by_schools rows of a year with rows, dicts of CountBySchool
+    columns without id. Does not commit.
+
+    The rows are loaded and indexed in a new table first, only then is the partition
+    of the year dropped and the new table attached in its place. count_by_schools is
+    locked from the drop until the caller commits.
+
+    :return int, number of rows written
+    """
+    year = int(year)
+    partition = partition_name(year)
+    staging = f"{partition}_new"
+    columns = CountBySchool.__table__.columns
+    natural_key = next(
+        _
+        for _ in CountBySchool.__table__.constraints
+        if _.name == "uq_count_by_schools_natural_key"
+    )
+
+    session.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+    # the defaults include the id sequence of count_by_schools
+    session.execute(text(f"CREATE TABLE {staging} (LIKE {PARENT} INCLUDING DEFAULTS)"))
+    # lets ATTACH PARTITION skip scanning the table for rows of other years
+    session.execute(
+        text(
+            f"ALTER TABLE {staging} "
+            f"ADD CONSTRAINT {staging}_year CHECK (year = {year})"
+        )
+    )
+    if rows:
+        # COPY into a table created in this transaction can write frozen rows
+        names = [_.name for _ in columns if _.name != "id"]
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows([row[_] for _ in names] for row in rows)
+        buffer.seek(0)
+        cursor = session.connection().connection.driver_connection.cursor()
+        cursor.copy_expert(
+            f"COPY {staging} ({', '.join(names)}) FROM STDIN WITH (FORMAT csv, FREEZE)",
+            buffer,
+        )
+    # ATTACH PARTITION takes matching constraints as the partition's keys
+    session.execute(
+        text(
+            f"ALTER TABLE {staging} "
+            f"ADD CONSTRAINT {staging}_pkey PRIMARY KEY "
+            f"({', '.join(_.name for _ in CountBySchool.__table__.primary_key)}), "
+            f"ADD CONSTRAINT {staging}_natural_key UNIQUE "
+            f"({', '.join(_.name for _ in natural_key.columns)})"
+        )
+    )
+
+    session.execute(text(f"DROP TABLE IF EXISTS {partition}"))
+    session.execute(text(f"ALTER TABLE {staging} RENAME TO {partition}"))
+    for suffix in ["year", "pkey", "natural_key"]:
+        session.execute(
+            text(
+                f"ALTER TABLE {partition} "
+                f"RENAME CONSTRAINT {staging}_{suffix} TO {partition}_{suffix}"
+            )
+        )
+    session.execute(
+        text(
+            f"ALTER TABLE {PARENT} ATTACH PARTITION {partition} FOR VALUES IN ({year})"
+        )
+    )
+    logger.info("Replaced partition %s with %s rows", partition, len(rows))
+    return len(rows)
@@ -0,0 +1,162 @@
+"""
+per request query count and database time
+
+instrument_queries hooks an engine's cursor executions, RequestStatsMiddleware
+attributes them to the request being served through a context variable. Each response
+gets a Server-Timing header, e.g. `db;dur=12.3;desc="7 queries", app;dur=40.2`, and a
+log line with the slowest statements.
+"""
+
+import heapq
+import logging
+import time
+from contextvars import ContextVar
+from starlette.datastructures import MutableHeaders
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# slowest statements kept per request
+SLOWEST_STATEMENTS = 3
+STATEMENT_LOG_LENGTH = 200
+
+
+class RequestStats:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.slowest = []  # min heap of (seconds, count, statement)
+
+    def record_query(self, statement: str, seconds: float) -> None:
+        self.query_count += 1
+        self.db_seconds += seconds
+        entry = (seconds, self.query_count, statement)
+        if len(self.slowest) < SLOWEST_STATEMENTS:
+            heapq.heappush(self.slowest, entry)
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def server_timing(self) -> str:
+        app_ms = (time.perf_counter() - self.started_at) * 1000
+        return (
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.query_count} queries", '
+            f"app;dur={app_ms:.1f}"
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "duration_ms": round((time.perf_counter() - self.started_at) * 1000, 1),
+            "queries": self.query_count,
+            "db_ms": round(self.db_seconds * 1000, 1),
+            "slowest": [
+                {
+                    "ms": round(seconds * 1000, 1),
+                    "statement": " ".join(statement.split())[:STATEMENT_LOG_LENGTH],
+                }
+                for seconds, _, statement in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+
+# stats of the request being served, None outside requests (importers, scripts)
+current_request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "current_request_stats", default=None
+)
+
+
+def instrument_queries(engine: Engine) -> None:
+    """
+    Count the engine's statements into the current request's stats. For an AsyncEngine
+    pass its sync_engine.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        if current_request_stats.get() is not None:
+            conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_request_stats.get()
+        if stats is not None and conn.info.get("query_started_at"):
+            started_at = conn.info["query_started_at"].pop()
+            stats.record_query(statement, time.perf_counter() - started_at)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # a failed statement gets no after_cursor_execute, do not leave its start time
+        # on the pooled connection
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started_at"):
+            started_at = conn.info["query_started_at"].pop()
+            stats = current_request_stats.get()
+            if stats is not None:
+                stats.record_query(
+                    exception_context.statement or "",
+                    time.perf_counter() - started_at,
+                )
+
+
+class RequestStatsMiddleware:
+    """
+    ASGI middleware collecting RequestStats for each http request.
+
+    The Server-Timing header is written when the response starts, so for a streamed
+    response it only covers the queries run before the first chunk; the log line is
+    written after the whole body was sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status = 500
+
+        async def send_with_server_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append(
+                    "Server-Timing", stats.server_timing()
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            current_request_stats.reset(token)
+            if logger.isEnabledFor(logging.INFO):
+                log_request(scope, status, stats)
+
+
+def log_request(scope, status: int, stats: RequestStats) -> None:
+    summary = stats.as_dict()
+    logger.info(
+        "%s %s %d in %.1f ms, %d queries, %.1f ms in db",
+        scope["method"],
+        scope["path"],
+        status,
+        summary["duration_ms"],
+        summary["queries"],
+        summary["db_ms"],
+        # for structured handlers, e.g. a JSON formatter
+        extra={
+            "request_stats": {
+                "method": scope["method"],
+                "path": scope["path"],
+                "query_string": scope["query_string"].decode(),
+                "status": status,
+                **summary,
+            }
+        },
+    )
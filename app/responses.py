@@ -0,0 +1,46 @@
+"""
+JSON encoding of the analysis responses
+
+With orjson installed (`poetry install -E fast`) responses are encoded by orjson, one
+pass in C over the nested dicts. Without it the stdlib json module encodes them the
+way starlette's JSONResponse does. Either way the route returns the encoded body
+itself, so FastAPI does not walk the results with jsonable_encoder first.
+"""
+
+import json
+from typing import Any, Awaitable
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional, see the "fast" extra
+    orjson = None
+
+
+def encode_json(content: Any) -> bytes:
+    """
+    The body JSONResponse(jsonable_encoder(content)) would send, jsonable_encoder is
+    only called for values the encoder does not know, e.g. Decimal.
+    """
+    if orjson is None:
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+            default=jsonable_encoder,
+        ).encode("utf-8")
+    return orjson.dumps(content, default=jsonable_encoder)
+
+
+async def encode_json_async(content: Awaitable[Any]) -> bytes:
+    return encode_json(await content)
+
+
+class EncodedJSONResponse(Response):
+    """
+    Response of a body from encode_json, e.g. one cached by app.cache.
+    """
+
+    media_type = "application/json"
@@ -0,0 +1,135 @@
+"""
+maintain the school_year_rollups table
+
+The analysis reads school_year_rollups instead of re-aggregating count_by_schools.
+Importers call refresh_rollups with the schools, years and campuses they touched,
+so only those rows are rebuilt.
+"""
+
+import logging
+from sqlalchemy import Insert, String, and_, cast, delete, func, insert, select
+from sqlalchemy.orm import Session
+from app.models import Campus, CountBySchool, HSPopulation, Race, SchoolYearRollup
+
+logger = logging.getLogger(__name__)
+
+
+def _count_sum(count_type: str):
+    return func.sum(CountBySchool.count).filter(CountBySchool.count_type == count_type)
+
+
+def refresh_rollups(
+    session: Session,
+    school_ids: list[int] | None = None,
+    years: list[str] | None = None,
+    campuses: list[str] | None = None,
+) -> int:
+    """
+    Rebuild the rollup rows matching all the given filters from count_by_schools and
+    hs_populations. Without filters the whole table is rebuilt. Does not commit.
+
+    :return int, number of rollup rows written
+    """
+    rollup_filters = []
+    if school_ids is not None:
+        rollup_filters.append(SchoolYearRollup.school_id.in_(school_ids))
+    if years is not None:
+        rollup_filters.append(SchoolYearRollup.year.in_(years))
+    if campuses is not None:
+        rollup_filters.append(SchoolYearRollup.campus.in_(campuses))
+
+    session.execute(delete(SchoolYearRollup).where(*rollup_filters))
+    result = session.execute(rollup_insert(school_ids, years, campuses))
+    logger.info(
+        "Refreshed %s rollup rows (schools: %s, years: %s, campuses: %s)",
+        result.rowcount,
+        "all" if school_ids is None else len(school_ids),
+        years or "all",
+        campuses or "all",
+    )
+    return result.rowcount
+
+
+def rollup_insert(
+    school_ids: list[int] | None = None,
+    years: list[str] | None = None,
+    campuses: list[str] | None = None,
+) -> Insert:
+    """
+    INSERT of the rollup rows matching all the given filters, see refresh_rollups.
+    """
+    count_filters = []
+    if school_ids is not None:
+        count_filters.append(CountBySchool.school_id.in_(school_ids))
+    if years is not None:
+        count_filters.append(CountBySchool.year.in_([int(_) for _ in years]))
+    if campuses is not None:
+        count_filters.append(Campus.name.in_(campuses))
+
+    # one 12th grade enrollment row per school, year and race, preferring no sub race
+    population_filters = [HSPopulation.count_type == "hs_enr"]
+    if school_ids is not None:
+        population_filters.append(HSPopulation.school_id.in_(school_ids))
+    if years is not None:
+        population_filters.append(HSPopulation.year.in_(years))
+    students = (
+        select(
+            HSPopulation.school_id,
+            HSPopulation.year,
+            HSPopulation.race,
+            HSPopulation.count,
+            func.row_number()
+            .over(
+                partition_by=[
+                    HSPopulation.school_id,
+                    HSPopulation.year,
+                    HSPopulation.race,
+                ],
+                order_by=[HSPopulation.sub_race.is_not(None), HSPopulation.id],
+            )
+            .label("row_number"),
+        )
+        .filter(*population_filters)
+        .subquery("students")
+    )
+    # the rollups keep the year, campus and race as the strings the analysis returns
+    year = cast(CountBySchool.year, String)
+    rollup_rows = (
+        select(
+            CountBySchool.school_id,
+            year,
+            Campus.name,
+            Race.name,
+            _count_sum("App"),
+            _count_sum("Adm"),
+            _count_sum("Enr"),
+            func.max(students.c.count),
+        )
+        .join(Campus, Campus.id == CountBySchool.campus_id)
+        .join(Race, Race.id == CountBySchool.race_id)
+        .outerjoin(
+            students,
+            and_(
+                students.c.school_id == CountBySchool.school_id,
+                students.c.year == year,
+                students.c.race == Race.name,
+                students.c.row_number == 1,
+            ),
+        )
+        .filter(*count_filters)
+        .group_by(CountBySchool.school_id, CountBySchool.year, Campus.name, Race.name)
+    )
+
+    return insert(SchoolYearRollup).from_select(
+        [
+            SchoolYearRollup.school_id,
+            SchoolYearRollup.year,
+            SchoolYearRollup.campus,
+            SchoolYearRollup.race,
+            SchoolYearRollup.app_count,
+            SchoolYearRollup.adm_count,
+            SchoolYearRollup.enr_count,
+            SchoolYearRollup.student_count,
+        ],
+        rollup_rows,
+    )
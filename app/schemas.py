@@ -0,0 +1,103 @@
+"""
+shapes of the /analyze responses
+
+Plain dicts at runtime, these only describe them: for type checkers and for the OpenAPI
+docs of the routes, which return the encoded JSON as is (see app.responses). Sections
+with a "/" in their name need the functional TypedDict syntax.
+"""
+
+from typing import TypedDict
+
+
+class RaceRate(TypedDict):
+    app: int | None
+    adm: int | None
+    enr: int | None
+    percentage: float | None
+
+
+class CampusYearRate(TypedDict):
+    all_app: int | None
+    all_adm: int | None
+    all_percentage: float | None
+    asian_app: int | None
+    asian_adm: int | None
+    asian_percentage: float | None
+    races: dict[str, RaceRate]
+
+
+# {campus: {year: rates}}, by_campus_rate
+CampusRates = dict[str, dict[str, CampusYearRate]]
+
+
+class SchoolInfo(TypedDict):
+    category: str | None
+    name: str
+    city: str | None
+
+
+class StudentDemo(TypedDict):
+    all_student_count: int | None
+    asian_student_count: int | None
+    asian_student_percentage: float | None
+
+
+class ApplicationPerStudent(TypedDict):
+    all_app_all_student: float | None
+    asian_app_asian_student: float | None
+    asian_app_all_student: float | None
+    all_adm_all_student: float | None
+    asian_adm_asian_student: float | None
+    asian_adm_all_student: float | None
+
+
+class AdmissionPerApplication(TypedDict):
+    all_app: int | None
+    all_adm: int | None
+    all_percentage: float | None
+    asian_app: int | None
+    asian_adm: int | None
+    asian_percentage: float | None
+
+
+class EnrollmentPerAdmission(TypedDict):
+    all_enr_count: int | None
+    asian_enr_count: int | None
+    all_enr_all_adm: float | None
+    asian_enr_asian_adm: float | None
+    asian_enr_all_adm: float | None
+
+
+# results of one campus, or of the selected campuses together
+CampusYearResults = TypedDict(
+    "CampusYearResults",
+    {
+        "application/student": ApplicationPerStudent,
+        "admission/application": AdmissionPerApplication,
+        "enrollment/admission": EnrollmentPerAdmission,
+    },
+)
+
+YearResults = TypedDict(
+    "YearResults",
+    {
+        "student_demo": StudentDemo,
+        "application/student": ApplicationPerStudent,
+        "admission/application": AdmissionPerApplication,
+        "enrollment/admission": EnrollmentPerAdmission,
+    },
+)
+
+# select_campus "individual": {"student_demo": ..., campus: CampusYearResults}
+IndividualYearResults = dict[str, StudentDemo | CampusYearResults]
+
+# {"school_info": SchoolInfo | None, year: results}
+SchoolResults = dict[str, SchoolInfo | YearResults | IndividualYearResults | None]
+
+# {school: results} in rank order, by_school_rate
+SchoolRates = dict[str, SchoolResults]
+
+
+class KeysetPage(TypedDict):
+    schools: SchoolRates
+    next_cursor: str | None
@@ -0,0 +1,348 @@
+"""
+memory-mapped analytics snapshot of the /analyze data
+
+The admission counts (school_year_rollups, i.e. count_by_schools summed next to the
+hs_populations enrollment) and high_schools are small enough to keep in memory. With
+ANALYTICS_SNAPSHOT_DIR set, /analyze answers by_campus_rate and by_school_rate pages from
+an uncompressed Arrow copy of them instead of Postgres.
+
+Every data version (see app.cache) gets a directory "<version>" with two Arrow files. It
+is written to a temporary directory and renamed into place, so a snapshot is either
+complete or absent. Every uvicorn worker maps the files read-only, the OS shares the
+pages between them. Workers read the data version at most every DATA_VERSION_TTL
+seconds and switch to the snapshot of a new version in one assignment; requests keep
+the snapshot they started with. The importers publish the snapshot of their version
+when they are done, a worker builds it itself if it is missing.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from app.aggregate import COUNT_COLUMNS, RACES
+from app.analyze_data import backend_campus_rates, backend_school_rate_page
+from app.cache import DATA_VERSION_TTL, data_version_query, read_data_version
+from app.database import session_factory
+from app.models import HighSchool, SchoolYearRollup
+from app.schemas import CampusRates, SchoolRates
+
+logger = logging.getLogger(__name__)
+
+# empty to answer /analyze from Postgres
+ANALYTICS_SNAPSHOT_DIR = os.getenv("ANALYTICS_SNAPSHOT_DIR", "")
+# snapshots of older data versions are removed, workers may still map the last ones
+SNAPSHOTS_KEPT = 2
+
+COUNTS_SCHEMA = pa.schema(
+    [
+        ("school_id", pa.int32()),
+        ("school", pa.dictionary(pa.int32(), pa.string())),
+        ("category", pa.dictionary(pa.int8(), pa.string())),
+        ("year", pa.dictionary(pa.int8(), pa.string())),
+        ("campus", pa.dictionary(pa.int8(), pa.string())),
+        ("race", pa.dictionary(pa.int8(), pa.string())),
+        ("app_count", pa.int32()),
+        ("adm_count", pa.int32()),
+        ("enr_count", pa.int32()),
+        ("student_count", pa.int32()),
+    ]
+)
+SCHOOLS_SCHEMA = pa.schema(
+    [
+        ("id", pa.int32()),
+        ("name", pa.string()),
+        ("city", pa.string()),
+        ("category", pa.string()),
+    ]
+)
+
+# sums of no rows are null, like SQL
+SUM_OPTIONS = pc.ScalarAggregateOptions(min_count=1)
+
+
+class AnalyticsSnapshot:
+    """
+    The memory-mapped tables of one data version, an analysis backend (see app.backends)
+    running the queries of app.aggregate on them.
+    """
+
+    def __init__(self, path: str, version: int | None):
+        self.path = path
+        self.version = version
+        self.counts = feather.read_table(
+            os.path.join(path, "counts.arrow"), memory_map=True
+        )
+        self.schools = feather.read_table(
+            os.path.join(path, "schools.arrow"), memory_map=True
+        )
+
+    def years(self) -> list[str]:
+        return pc.unique(self.counts["year"]).dictionary_decode().to_pylist()
+
+    def school_counts(
+        self,
+        years: list[str],
+        select_campus: str = "all",
+        select_school_type: str = "all",
+        schools: list[str] | None = None,
+        by_campus: bool = False,
+    ) -> pd.DataFrame:
+        """
+        aggregate.load_school_counts on the snapshot.
+        """
+        counts = self.counts
+        mask = pc.and_(
+            pc.is_in(counts["year"], value_set=pa.array(years, pa.string())),
+            pc.is_in(counts["race"], value_set=pa.array(RACES)),
+        )
+        if select_campus not in ["all", "individual"]:
+            mask = pc.and_(mask, pc.equal(counts["campus"], select_campus))
+        if schools is None and select_school_type in ["public", "private"]:
+            # like school_names_subquery, every school of a name of that category
+            schools = (
+                pc.unique(
+                    counts.filter(pc.equal(counts["category"], select_school_type))[
+                        "school"
+                    ]
+                )
+                .dictionary_decode()
+                .to_pylist()
+            )
+        if schools is not None:
+            mask = pc.and_(
+                mask,
+                pc.is_in(counts["school"], value_set=pa.array(schools, pa.string())),
+            )
+        keys = ["school", "year", *(["campus"] if by_campus else [])]
+        totals = (
+            counts.filter(mask)
+            .group_by([*keys, "race"])
+            .aggregate(
+                [
+                    ([], "count_all"),
+                    ("app_count", "sum", SUM_OPTIONS),
+                    ("adm_count", "sum", SUM_OPTIONS),
+                    ("enr_count", "sum", SUM_OPTIONS),
+                    ("student_count", "max", SUM_OPTIONS),
+                ]
+            )
+            .to_pandas()
+        )
+        if totals.empty:
+            return pd.DataFrame(columns=[*keys, "all_rows", *COUNT_COLUMNS])
+        for key in [*keys, "race"]:
+            totals[key] = totals[key].astype(str)
+        wide = totals.pivot(index=keys, columns="race")
+        result = pd.DataFrame(index=wide.index)
+        for race in RACES:
+            prefix = race.lower()
+
+            def column(name: str) -> pd.Series:
+                if (name, race) in wide:
+                    return wide[(name, race)]
+                return pd.Series(np.nan, index=wide.index)
+
+            if race == "All":
+                result["all_rows"] = column("count_all").fillna(0).astype(int)
+            result[f"{prefix}_app"] = column("app_count_sum")
+            result[f"{prefix}_adm"] = column("adm_count_sum")
+            result[f"{prefix}_enr"] = column("enr_count_sum")
+            result[f"{prefix}_students"] = column("student_count_max")
+        result = result.reset_index()
+        result[COUNT_COLUMNS] = result[COUNT_COLUMNS].astype(float)
+        return result[[*keys, "all_rows", *COUNT_COLUMNS]]
+
+    def school_info(self, schools: list[str]) -> dict:
+        """
+        aggregate.load_school_info of the given school names.
+        """
+        rows = self.schools.filter(
+            pc.is_in(self.schools["name"], value_set=pa.array(schools, pa.string()))
+        ).sort_by("id")
+        info = {}
+        for category, name, city in zip(
+            *(rows[_].to_pylist() for _ in ["category", "name", "city"])
+        ):
+            info.setdefault(name, {"category": category, "name": name, "city": city})
+        return info
+
+    def campus_counts(self) -> list[tuple]:
+        """
+        (campus, year, race, app, adm, enr) sums of every campus, year and race.
+        """
+        totals = self.counts.group_by(["campus", "year", "race"]).aggregate(
+            [
+                ("app_count", "sum", SUM_OPTIONS),
+                ("adm_count", "sum", SUM_OPTIONS),
+                ("enr_count", "sum", SUM_OPTIONS),
+            ]
+        )
+        return list(
+            zip(
+                *(
+                    totals[_].to_pylist()
+                    for _ in [
+                        "campus",
+                        "year",
+                        "race",
+                        "app_count_sum",
+                        "adm_count_sum",
+                        "enr_count_sum",
+                    ]
+                )
+            )
+        )
+
+
+def snapshot_path(directory: str, version: int | None) -> str:
+    return os.path.join(os.path.expanduser(directory), str(version or 0))
+
+
+def publish_snapshot(directory: str = ANALYTICS_SNAPSHOT_DIR) -> str:
+    """
+    Write the snapshot of the current data version, unless it exists already.
+
+    :return str, path of the snapshot
+    """
+    with session_factory() as session:
+        # the data and its version from the same database snapshot
+        session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        version = session.scalar(data_version_query())
+        path = snapshot_path(directory, version)
+        if os.path.isdir(path):
+            return path
+        count_rows = session.execute(
+            select(
+                SchoolYearRollup.school_id,
+                HighSchool.name,
+                HighSchool.category,
+                SchoolYearRollup.year,
+                SchoolYearRollup.campus,
+                SchoolYearRollup.race,
+                SchoolYearRollup.app_count,
+                SchoolYearRollup.adm_count,
+                SchoolYearRollup.enr_count,
+                SchoolYearRollup.student_count,
+            ).join(HighSchool, HighSchool.id == SchoolYearRollup.school_id)
+        ).all()
+        school_rows = session.execute(
+            select(HighSchool.id, HighSchool.name, HighSchool.city, HighSchool.category)
+        ).all()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=".tmp-", dir=os.path.dirname(path))
+    try:
+        # readable by workers running as another user
+        os.chmod(tmp_path, 0o755)
+        for name, rows, schema in [
+            ("counts.arrow", count_rows, COUNTS_SCHEMA),
+            ("schools.arrow", school_rows, SCHOOLS_SCHEMA),
+        ]:
+            columns = list(zip(*rows)) or [[] for _ in schema]
+            table = pa.table(
+                [
+                    (
+                        pa.array(values, field.type.value_type).dictionary_encode()
+                        if pa.types.is_dictionary(field.type)
+                        else pa.array(values, field.type)
+                    )
+                    for values, field in zip(columns, schema)
+                ],
+                names=schema.names,
+            )
+            # uncompressed, so readers map the file instead of decompressing it
+            feather.write_feather(
+                table, os.path.join(tmp_path, name), compression="uncompressed"
+            )
+        os.rename(tmp_path, path)
+    except OSError:
+        # another process published this version first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.isdir(path):
+            raise
+    else:
+        logger.info(
+            "Published analytics snapshot %s, %d count rows", path, len(count_rows)
+        )
+    remove_old_snapshots(os.path.dirname(path))
+    return path
+
+
+def remove_old_snapshots(directory: str, kept: int = SNAPSHOTS_KEPT) -> None:
+    versions = sorted(int(_) for _ in os.listdir(directory) if _.isdigit())
+    for version in versions[:-kept]:
+        # workers still mapping the files keep reading them, the OS frees them after
+        shutil.rmtree(os.path.join(directory, str(version)), ignore_errors=True)
+
+
+class SnapshotStore:
+    """
+    The AnalyticsSnapshot of the current data version in this process. Thread safe.
+    """
+
+    def __init__(
+        self,
+        directory: str = ANALYTICS_SNAPSHOT_DIR,
+        version_ttl: float = DATA_VERSION_TTL,
+    ):
+        self.directory = directory
+        self.version_ttl = version_ttl
+        self.snapshot = None
+        self.version_checked_at = None
+        self.lock = threading.Lock()
+
+    def current(self) -> AnalyticsSnapshot:
+        with self.lock:
+            if (
+                self.snapshot is None
+                or time.monotonic() - self.version_checked_at >= self.version_ttl
+            ):
+                version = read_data_version()
+                if self.snapshot is None or version != self.snapshot.version:
+                    self.snapshot = self.load(version)
+                self.version_checked_at = time.monotonic()
+            return self.snapshot
+
+    def load(self, version: int | None) -> AnalyticsSnapshot:
+        path = snapshot_path(self.directory, version)
+        if not os.path.isdir(path):
+            path = publish_snapshot(self.directory)
+        try:
+            snapshot = AnalyticsSnapshot(path, int(os.path.basename(path)) or None)
+        except FileNotFoundError:
+            # removed by a newer import meanwhile
+            path = publish_snapshot(self.directory)
+            snapshot = AnalyticsSnapshot(path, int(os.path.basename(path)) or None)
+        logger.info("Mapped analytics snapshot %s", path)
+        return snapshot
+
+
+analytics_snapshots = SnapshotStore()
+
+
+def snapshot_campus_rates() -> CampusRates:
+    return backend_campus_rates(analytics_snapshots.current())
+
+
+def snapshot_school_rates(**kwargs) -> SchoolRates:
+    """
+    backend_school_rate_page of the current snapshot, kwargs as by_school_rate.
+    """
+    return backend_school_rate_page(analytics_snapshots.current(), **kwargs)
+
+
+async def snapshot_campus_rates_async() -> CampusRates:
+    return await run_in_threadpool(snapshot_campus_rates)
+
+
+async def snapshot_school_rates_async(**kwargs) -> SchoolRates:
+    return await run_in_threadpool(snapshot_school_rates, **kwargs)
@@ -0,0 +1,96 @@
+"""
+/analyze latency without the response cache, on a miss and on a hit
+
+Calls the route function for a few dashboard queries and reports the median latency
+uncached, on the first (cold) call and on repeated (warm) calls, with the data version
+read on every call and with the default DATA_VERSION_TTL. Then bumps the data
+version like an import does and checks that the next call is computed again.
+
+    BENCH_DATABASE_URL=... poetry run python -m benchmarks.bench_analyze_cache [school count]
+"""
+
+import asyncio
+import contextlib
+import io
+import sys
+import time
+from sqlalchemy.orm import Session
+from benchmarks.common import (
+    count_queries,
+    make_engine,
+    reset_schema,
+    seed,
+    timed_async,
+)
+from app.cache import DATA_VERSION_TTL, ResponseCache, bump_data_version
+from app import main as app_main
+from app.database import async_session_factory
+
+SCHOOL_COUNT = 400
+QUERIES = {
+    "campus": {"by": "campus"},
+    "school all p1": {},
+    "school all p5": {"page": 5},
+    "school ucla/2022/public": {
+        "select_campus": "ucla",
+        "select_year": "2022",
+        "select_school_type": "public",
+    },
+}
+
+
+async def main(school_count: int) -> None:
+    engine = make_engine()
+    reset_schema(engine)
+    seed(engine, school_count)
+    # read the stamp on every call, the worst case for a hit, unless measuring with the
+    # default DATA_VERSION_TTL
+    app_main.analyze_cache = cache = ResponseCache(version_ttl=0)
+
+    rows = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for params in QUERIES.values():
+            cache.maxsize = 0
+            _, uncached = await timed_async(lambda: app_main.analyze_data(**params))
+            cache.maxsize = 256
+            start = time.perf_counter()
+            await app_main.analyze_data(**params)
+            cold = time.perf_counter() - start
+            _, warm = await timed_async(
+                lambda: app_main.analyze_data(**params), repeat=100
+            )
+            cache.version_ttl = DATA_VERSION_TTL
+            _, warm_ttl = await timed_async(
+                lambda: app_main.analyze_data(**params), repeat=100
+            )
+            cache.version_ttl = 0
+            rows.append((uncached, cold, warm, warm_ttl))
+
+        first_page = await app_main.analyze_data(**QUERIES["school all p1"])
+        # the routes query through the asyncpg engine
+        with count_queries(async_session_factory.kw["bind"].sync_engine) as counter:
+            await app_main.analyze_data(**QUERIES["school all p1"])
+        with Session(engine) as session:
+            bump_data_version(session)
+            session.commit()
+        misses = cache.misses
+        recomputed = await app_main.analyze_data(**QUERIES["school all p1"])
+
+    print(
+        f"{'query':<26} {'uncached ms':>12} {'cold ms':>8} {'warm ms':>8} {'warm, ttl us':>13}"
+    )
+    for name, (uncached, cold, warm, warm_ttl) in zip(QUERIES, rows):
+        print(
+            f"{name:<26} {uncached * 1000:>12.2f} {cold * 1000:>8.2f} "
+            f"{warm * 1000:>8.3f} {warm_ttl * 1e6:>13.1f}"
+        )
+    print(f"queries per hit: {counter['queries']} (the data version check)")
+    print(
+        f"recomputed after a version bump: {cache.misses == misses + 1}, "
+        f"same response: {recomputed.body == first_page.body}"
+    )
+    reset_schema(engine)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else SCHOOL_COUNT))
@@ -0,0 +1,160 @@
+"""
+/analyze under concurrent load: sync route on psycopg2 vs. async route on asyncpg
+
+Serves each app with uvicorn on a local port and sends a mix of dashboard requests at
+increasing concurrency, reporting requests per second and median / p95 latency. The
+sync app is the route as it was before going async, run in Starlette's thread pool.
+The response cache is off, so every request hits the database. Both engines use the
+DB_POOL_* settings (default 5 connections plus 10 overflow), and their pool metrics
+show how much of the latency was spent waiting for a connection.
+
+    BENCH_DATABASE_URL=... DB_POOL_SIZE=... poetry run python -m benchmarks.bench_analyze_load [school count] [requests]
+"""
+
+import asyncio
+import contextlib
+import io
+import socket
+import statistics
+import sys
+import time
+import uvicorn
+from fastapi import FastAPI
+from benchmarks.common import make_engine, reset_schema, seed
+from app import main as app_main
+from app.analyze_data import by_campus_rate, by_school_rate
+from app.database import pool_stats
+
+SCHOOL_COUNT = 400
+REQUEST_COUNT = 100
+CONCURRENCY = [1, 8, 32, 64]
+PATHS = [
+    "/analyze?by=campus",
+    "/analyze",
+    "/analyze?page=3",
+    "/analyze?select_campus=ucla&select_year=2022&select_school_type=public",
+]
+
+sync_app = FastAPI()
+
+
+@sync_app.get("/analyze")
+def analyze_data_sync(
+    by: str = "school",
+    select_campus: str = "all",
+    select_year: str = "all",
+    select_school_type: str = "all",
+    page: int = 1,
+    page_size: int = 10,
+):
+    if by == "campus":
+        return by_campus_rate()
+
+    return by_school_rate(
+        select_campus=select_campus,
+        select_year=select_year,
+        select_school_type=select_school_type,
+        offset=(page - 1) * page_size,
+        limit=page_size,
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def get(port: int, path: str) -> float:
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode()
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    status = response.split(b" ", 2)[1]
+    if status != b"200":
+        raise RuntimeError(f"GET {path} returned {status.decode()}")
+    return time.perf_counter() - start
+
+
+async def load(port: int, concurrency: int, request_count: int) -> tuple:
+    """
+    :return tuple, (requests per second, median latency, p95 latency) in seconds
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(path: str) -> float:
+        async with semaphore:
+            return await get(port, path)
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(
+        *[request(PATHS[i % len(PATHS)]) for i in range(request_count)]
+    )
+    duration = time.perf_counter() - start
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    return request_count / duration, statistics.median(latencies), p95
+
+
+async def serve_and_load(app: FastAPI, request_count: int) -> list[tuple]:
+    port = free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    try:
+        await load(port, 1, len(PATHS))  # warm up the pools
+        return [
+            await load(port, concurrency, request_count) for concurrency in CONCURRENCY
+        ]
+    finally:
+        server.should_exit = True
+        await serving
+
+
+async def main(school_count: int, request_count: int) -> None:
+    engine = make_engine()
+    reset_schema(engine)
+    seed(engine, school_count)
+    app_main.analyze_cache.maxsize = 0
+
+    reports = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, app in [("sync", sync_app), ("async", app_main.app)]:
+            reports[name] = await serve_and_load(app, request_count)
+
+    print(f"{school_count} schools, {request_count} requests per run")
+    print(f"{'route':<6} {'concurrency':>11} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, results in reports.items():
+        for concurrency, (throughput, p50, p95) in zip(CONCURRENCY, results):
+            print(
+                f"{name:<6} {concurrency:>11} {throughput:>7.1f} "
+                f"{p50 * 1000:>8.1f} {p95 * 1000:>8.1f}"
+            )
+
+    print(
+        f"{'pool':<6} {'checkouts':>9} {'wait mean ms':>12} {'wait max ms':>11} "
+        f"{'slow':>5} {'peak in use':>11} {'timeouts':>8}"
+    )
+    for name, stats in pool_stats().items():
+        print(
+            f"{name:<6} {stats['checkouts']:>9} {stats['wait_ms_mean'] or 0:>12.1f} "
+            f"{stats['wait_ms_max']:>11.1f} {stats['slow_checkouts']:>5} "
+            f"{stats['peak_checked_out']:>11} {stats['timeouts']:>8}"
+        )
+    reset_schema(engine)
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else SCHOOL_COUNT,
+            int(sys.argv[2]) if len(sys.argv) > 2 else REQUEST_COUNT,
+        )
+    )
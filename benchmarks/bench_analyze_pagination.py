@@ -0,0 +1,75 @@
+"""
+by_school_rate pagination: sort everything in python vs. rank in SQL and build one page
+vs. keyset pages that continue after the previous page's last school
+
+For each seeded size, reports the latency of the first and of a deep page of 10 schools
+in each mode, and whether all modes return the same page.
+
+    BENCH_DATABASE_URL=... poetry run python -m benchmarks.bench_analyze_pagination
+"""
+
+import contextlib
+import io
+import sys
+from benchmarks.common import make_engine, reset_schema, seed, timed
+from app.aggregate import analysis_years, seek_schools
+from app.analyze_data import by_school_rate, by_school_rate_keyset
+from app.database import session_factory
+
+SCHOOL_COUNTS = [100, 400, 1600]
+PAGE_SIZE = 10
+
+
+def cursor_before(offset: int) -> tuple | None:
+    """
+    Sort keys of the school before offset, what the previous page's next_cursor holds.
+    """
+    if not offset:
+        return None
+    with session_factory() as session:
+        loop_years, sort_by_year = analysis_years(session)
+        row = seek_schools(session, loop_years, sort_by_year, limit=offset)[-1]
+    return row.first_sort_key, row.second_sort_key, row.school
+
+
+def main(school_counts: list[int]) -> None:
+    engine = make_engine()
+    print(
+        f"{'schools':>8} {'page':>6} {'python s':>9} {'sql s':>9} {'keyset s':>9} {'same':>5}"
+    )
+    for school_count in school_counts:
+        reset_schema(engine)
+        seed(engine, school_count)
+        last_page = max(1, school_count // PAGE_SIZE - 1)
+        for page in [1, last_page]:
+            params = {
+                "select_campus": "all",
+                "offset": (page - 1) * PAGE_SIZE,
+                "limit": PAGE_SIZE,
+            }
+            keyset_params = {
+                "select_campus": "all",
+                "after": cursor_before(params["offset"]),
+                "limit": PAGE_SIZE,
+            }
+            with contextlib.redirect_stdout(io.StringIO()):
+                expected = by_school_rate(**params, rank_in_sql=False)
+                actual = by_school_rate(**params, rank_in_sql=True)
+                keyset = by_school_rate_keyset(**keyset_params)["schools"]
+                _, python_time = timed(
+                    lambda: by_school_rate(**params, rank_in_sql=False)
+                )
+                _, sql_time = timed(lambda: by_school_rate(**params, rank_in_sql=True))
+                _, keyset_time = timed(lambda: by_school_rate_keyset(**keyset_params))
+            same = (
+                list(expected.items()) == list(actual.items()) == list(keyset.items())
+            )
+            print(
+                f"{school_count:>8} {page:>6} {python_time:>9.3f} {sql_time:>9.3f} "
+                f"{keyset_time:>9.3f} {str(same):>5}"
+            )
+    reset_schema(engine)
+
+
+if __name__ == "__main__":
+    main([int(_) for _ in sys.argv[1:]] or SCHOOL_COUNTS)
@@ -0,0 +1,74 @@
+"""
+analysis backends side by side: analyze_data on Postgres vs. SQLAlchemyBackend vs.
+DuckDBBackend loaded from the Parquet export
+
+Seeds a growing number of schools, times export_parquet and DuckDBBackend.from_parquet,
+then reports the time of by_campus_rate, of one by_school_rate page and of the whole
+ranking through each, and whether all of them return the same results.
+
+    BENCH_DATABASE_URL=... poetry run python -m benchmarks.bench_backends
+"""
+
+import sys
+import tempfile
+import time
+from benchmarks.common import make_engine, reset_schema, seed, timed
+from app.analyze_data import (
+    backend_campus_rates,
+    backend_school_rate_page,
+    by_campus_rate,
+    by_school_rate,
+)
+from app.backends import DuckDBBackend, SQLAlchemyBackend, export_parquet
+from app.database import session_factory
+
+SCHOOL_COUNTS = [100, 400, 1600]
+CASES = {
+    "campus": None,
+    "page": {"select_campus": "all", "offset": 0, "limit": 10},
+    "individual": {"select_campus": "individual", "offset": 0, "limit": 10},
+    "ranking": {"select_campus": "all", "offset": 0, "limit": 10**9},
+}
+
+
+def run(backend, params: dict | None):
+    if backend is None:
+        return by_campus_rate() if params is None else by_school_rate(**params)
+    if params is None:
+        return backend_campus_rates(backend)
+    return backend_school_rate_page(backend, **params)
+
+
+def main(school_counts: list[int]) -> None:
+    engine = make_engine()
+    print(
+        f"{'schools':>8} {'case':<11} {'postgres s':>11} {'sqlalchemy s':>13} "
+        f"{'duckdb s':>9} {'same':>5}"
+    )
+    for school_count in school_counts:
+        reset_schema(engine)
+        seed(engine, school_count)
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            export_parquet(directory)
+            exported = time.perf_counter()
+            duckdb_backend = DuckDBBackend.from_parquet(directory)
+            loaded = time.perf_counter()
+        print(
+            f"{school_count:>8} export {exported - start:.2f} s, "
+            f"DuckDB load {loaded - exported:.2f} s"
+        )
+        with session_factory() as session:
+            backends = [None, SQLAlchemyBackend(session), duckdb_backend]
+            for case, params in CASES.items():
+                results = [run(backend, params) for backend in backends]
+                row = f"{school_count:>8} {case:<11}"
+                for backend, width in zip(backends, [11, 13, 9]):
+                    _, duration = timed(lambda: run(backend, params))
+                    row += f" {duration:>{width}.3f}"
+                print(row + f" {str(all(_ == results[0] for _ in results)):>5}")
+    reset_schema(engine)
+
+
+if __name__ == "__main__":
+    main([int(_) for _ in sys.argv[1:]] or SCHOOL_COUNTS)
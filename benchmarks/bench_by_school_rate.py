@@ -0,0 +1,69 @@
+"""
+by_school_rate: per school queries vs. the grouped aggregation engine
+
+Seeds a growing number of schools and reports, for each size, how many statements and
+how much time each implementation needs, and whether both return the same ranking.
+
+    BENCH_DATABASE_URL=... poetry run python -m benchmarks.bench_by_school_rate
+"""
+
+import contextlib
+import io
+import sys
+from benchmarks.common import count_queries, make_engine, reset_schema, seed, timed
+from benchmarks.legacy import by_school_rate_per_school
+from app.analyze_data import by_school_rate, get_first_sort_key, get_second_sort_key
+
+SCHOOL_COUNTS = [25, 50, 100, 200]
+PARAMS = [
+    {"select_campus": "all", "select_year": "all", "select_school_type": "all"},
+    {"select_campus": "ucla", "select_year": "2022", "select_school_type": "public"},
+]
+ALL_ROWS = {"offset": 0, "limit": 10**9}
+
+
+def same_results(expected: dict, actual: dict, sort_by_year: str) -> bool:
+    # schools with equal sort keys may come back in a different order
+    def keys(results):
+        return [
+            (get_first_sort_key(v, sort_by_year), get_second_sort_key(v, sort_by_year))
+            for v in results.values()
+        ]
+
+    return expected == actual and keys(expected) == keys(actual)
+
+
+def main(school_counts: list[int]) -> None:
+    engine = make_engine()
+    print(
+        f"{'schools':>8} {'params':<24} {'old queries':>12} {'old s':>8} "
+        f"{'new queries':>12} {'new s':>8} {'same':>5}"
+    )
+    for school_count in school_counts:
+        reset_schema(engine)
+        seed(engine, school_count)
+        for params in PARAMS:
+            sort_by_year = (
+                "2023" if params["select_year"] == "all" else params["select_year"]
+            )
+            # keep the diagnostics printed by the analysis functions out of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                with count_queries(engine) as old_counter:
+                    expected = by_school_rate_per_school(**params, **ALL_ROWS)
+                with count_queries(engine) as new_counter:
+                    actual = by_school_rate(**params, **ALL_ROWS)
+                _, old_time = timed(
+                    lambda: by_school_rate_per_school(**params, **ALL_ROWS)
+                )
+                _, new_time = timed(lambda: by_school_rate(**params, **ALL_ROWS))
+            label = f"{params['select_campus']}/{params['select_year']}/{params['select_school_type']}"
+            print(
+                f"{school_count:>8} {label:<24} {old_counter['queries']:>12} {old_time:>8.3f} "
+                f"{new_counter['queries']:>12} {new_time:>8.3f} "
+                f"{str(same_results(expected, actual, sort_by_year)):>5}"
+            )
+    reset_schema(engine)
+
+
+if __name__ == "__main__":
+    main([int(_) for _ in sys.argv[1:]] or SCHOOL_COUNTS)
@@ -0,0 +1,118 @@
+"""
+by_campus_rate: queries per campus and year vs. the one GROUP BY of campus_rates
+
+Seeds a growing number of schools, drops the Asian admissions of one campus and year
+to have an empty group, and reports statements and time of each way, and whether both
+agree on the counts of every campus, year and race.
+
+    BENCH_DATABASE_URL=... poetry run python -m benchmarks.bench_campus_rate
+"""
+
+import sys
+from sqlalchemy import delete, func, select
+from benchmarks.common import (
+    CAMPUSES,
+    YEARS,
+    count_queries,
+    make_engine,
+    reset_schema,
+    seed,
+    timed,
+)
+from app.analyze_data import by_campus_rate
+from app.database import session_factory
+from app.models import Campus, CountBySchool, Race
+from app.rollup import refresh_rollups
+
+SCHOOL_COUNTS = [100, 400, 1600]
+
+
+def per_campus_year() -> dict:
+    # like by_campus_rate used to, one query per campus, year and race
+    with session_factory() as session:
+        campuses = session.scalars(select(Campus.name)).all()
+        years = [str(_) for _ in session.scalars(select(CountBySchool.year).distinct())]
+        races = session.scalars(select(Race.name)).all()
+        results = {}
+        for campus in sorted(campuses):
+            for year in sorted(years):
+                for race in races:
+                    counts = dict(
+                        session.execute(
+                            select(
+                                CountBySchool.count_type, func.sum(CountBySchool.count)
+                            )
+                            .join(Campus, Campus.id == CountBySchool.campus_id)
+                            .join(Race, Race.id == CountBySchool.race_id)
+                            .filter(
+                                Campus.name == campus,
+                                CountBySchool.year == int(year),
+                                Race.name == race,
+                            )
+                            .group_by(CountBySchool.count_type)
+                        ).all()
+                    )
+                    results.setdefault(campus, {}).setdefault(year, {})[race] = (
+                        counts.get("App"),
+                        counts.get("Adm"),
+                        counts.get("Enr"),
+                    )
+        return results
+
+
+def one_query() -> dict:
+    return {
+        campus: {
+            year: {
+                race: (rates["app"], rates["adm"], rates["enr"])
+                for race, rates in year_res["races"].items()
+            }
+            for year, year_res in campus_res.items()
+        }
+        for campus, campus_res in by_campus_rate().items()
+    }
+
+
+def drop_group() -> None:
+    with session_factory() as session:
+        session.execute(
+            delete(CountBySchool).filter(
+                CountBySchool.campus_id
+                == select(Campus.id)
+                .filter(Campus.name == CAMPUSES[0])
+                .scalar_subquery(),
+                CountBySchool.year == int(YEARS[0]),
+                CountBySchool.race_id
+                == select(Race.id).filter(Race.name == "Asian").scalar_subquery(),
+                CountBySchool.count_type == "Adm",
+            )
+        )
+        refresh_rollups(session, campuses=[CAMPUSES[0]], years=[YEARS[0]])
+        session.commit()
+
+
+def main(school_counts: list[int]) -> None:
+    engine = make_engine()
+    ways = [per_campus_year, one_query]
+    print(
+        f"{'schools':>8} "
+        + " ".join(f"{_.__name__ + ' q':>17} {_.__name__ + ' s':>17}" for _ in ways)
+        + f" {'same':>5}"
+    )
+    for school_count in school_counts:
+        reset_schema(engine)
+        seed(engine, school_count)
+        drop_group()
+        row = f"{school_count:>8}"
+        results = []
+        for way in ways:
+            with count_queries(engine) as counter:
+                results.append(way())
+            _, duration = timed(way)
+            row += f" {counter['queries']:>17} {duration:>17.3f}"
+        print(row + f" {str(results[0] == results[1]):>5}")
+    reset_schema(engine)
+
+
+if __name__ == "__main__":
+    main([int(_) for _ in sys.argv[1:]] or SCHOOL_COUNTS)
@@ -0,0 +1,59 @@
+"""
+count_by_schools storage: row width, table and index size, scan and rollup rebuild time
+
+Seeds a growing number of schools and reports the average row width, the heap and index
+sizes of count_by_schools, the time of a full scan summing every count, and the time of
+refresh_rollups rebuilding school_year_rollups from all of it.
+
+    BENCH_DATABASE_URL=... poetry run python -m benchmarks.bench_count_storage
+"""
+
+import sys
+from sqlalchemy import text
+from benchmarks.common import make_engine, reset_schema, seed, timed
+from app.database import session_factory
+from app.rollup import refresh_rollups
+
+SCHOOL_COUNTS = [400, 1600, 6400]
+# summed over the partitions, if any
+SIZES = """
+    SELECT
+        (SELECT avg(pg_column_size(c.*)) FROM count_by_schools c),
+        sum(pg_relation_size(relid)),
+        sum(pg_indexes_size(relid))
+    FROM pg_partition_tree('count_by_schools')
+"""
+SCAN = "SELECT count_type, sum(count) FROM count_by_schools GROUP BY count_type"
+
+
+def rebuild_rollups() -> None:
+    with session_factory() as session:
+        refresh_rollups(session)
+        session.commit()
+
+
+def main(school_counts: list[int]) -> None:
+    engine = make_engine()
+    print(
+        f"{'schools':>8} {'rows':>8} {'row B':>6} {'table KB':>9} {'index KB':>9} "
+        f"{'scan s':>7} {'rollups s':>10}"
+    )
+    for school_count in school_counts:
+        reset_schema(engine)
+        seed(engine, school_count)
+        # VACUUM runs outside a transaction
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM ANALYZE count_by_schools"))
+            rows = conn.scalar(text("SELECT count(*) FROM count_by_schools"))
+            row_width, table_size, index_size = conn.execute(text(SIZES)).one()
+            scan, _ = timed(lambda: conn.execute(text(SCAN)).all())
+        rollups, _ = timed(rebuild_rollups)
+        print(
+            f"{school_count:>8} {rows:>8} {row_width:>6.1f} {table_size / 1024:>9.0f} "
+            f"{index_size / 1024:>9.0f} {scan:>7.3f} {rollups:>10.3f}"
+        )
+    reset_schema(engine)
+
+
+if __name__ == "__main__":
+    main([int(_) for _ in sys.argv[1:]] or SCHOOL_COUNTS)
@@ -0,0 +1,74 @@
+"""
+full ranking: paging through by_school_rate vs. the streaming NDJSON export
+
+Seeds a growing number of schools and reports statements, time and peak python memory
+(tracemalloc) to get every school in rank order by requesting pages of 10, by building
+all results at once, and by consuming export.export_school_rates. Also checks that the
+export has the same schools and results in the same order.
+
+    BENCH_DATABASE_URL=... poetry run python -m benchmarks.bench_export
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+from benchmarks.common import count_queries, make_engine, reset_schema, seed
+from app.analyze_data import by_school_rate
+from app.export import export_school_rates
+
+SCHOOL_COUNTS = [400, 1600]
+PAGE_SIZE = 10
+
+
+def pages() -> list:
+    results = []
+    offset = 0
+    while page := by_school_rate(select_campus="all", offset=offset, limit=PAGE_SIZE):
+        results += page.items()
+        offset += PAGE_SIZE
+    return results
+
+
+def all_at_once() -> list:
+    return list(by_school_rate(select_campus="all", limit=10**9).items())
+
+
+def export() -> list:
+    # keep only the first line, like a client writing the lines to a file
+    first_line = None
+    for line in export_school_rates("ndjson", select_campus="all"):
+        first_line = first_line or line
+    return [first_line]
+
+
+def main(school_counts: list[int]) -> None:
+    engine = make_engine()
+    print(f"{'schools':>8} {'way':<12} {'queries':>8} {'s':>8} {'peak MB':>8}")
+    for school_count in school_counts:
+        reset_schema(engine)
+        seed(engine, school_count)
+        for way in [pages, all_at_once, export]:
+            with count_queries(engine) as counter:
+                start = time.perf_counter()
+                way()
+                duration = time.perf_counter() - start
+            # separate run, tracing slows python down
+            tracemalloc.start()
+            way()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{school_count:>8} {way.__name__:<12} {counter['queries']:>8} "
+                f"{duration:>8.2f} {peak / 2**20:>8.1f}"
+            )
+        exported = [
+            json.loads(line) for line in export_school_rates(select_campus="all")
+        ]
+        expected = [{"school": school, **results} for school, results in all_at_once()]
+        print(f"same: {exported == expected}")
+    reset_schema(engine)
+
+
+if __name__ == "__main__":
+    main([int(_) for _ in sys.argv[1:]] or SCHOOL_COUNTS)
@@ -0,0 +1,83 @@
+"""
+admissions workbook import: save_file_to_db vs. bulk_save_file_to_db
+
+Imports a generated workbook twice (new rows, then the existing-row path) with each
+importer into an empty scratch database and reports wall time, rows per second and
+whether both leave the same rows and counters behind.
+
+    BENCH_DATABASE_URL=... poetry run python -m benchmarks.bench_import [school count]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from sqlalchemy import select
+from benchmarks.common import make_engine, reset_schema, write_admissions_workbook
+from app.import_data import bulk_save_file_to_db, save_file_to_db
+from app.models import Campus, CountBySchool, HighSchool, Race
+
+SCHOOL_COUNT = 50
+
+
+def table_rows(engine) -> list[tuple]:
+    columns = [
+        CountBySchool.year,
+        Campus.name,
+        HighSchool.name,
+        HighSchool.city,
+        Race.name,
+        CountBySchool.count_type,
+        CountBySchool.count,
+    ]
+    with engine.connect() as conn:
+        return conn.execute(
+            select(*columns)
+            .join(HighSchool, HighSchool.id == CountBySchool.school_id)
+            .join(Campus, Campus.id == CountBySchool.campus_id)
+            .join(Race, Race.id == CountBySchool.race_id)
+            .order_by(*columns)
+        ).all()
+
+
+def run(engine, importer, workbook_path: str) -> tuple[list, list, list]:
+    reset_schema(engine)
+    timings = []
+    counters = []
+    for _ in range(2):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            results = importer(file_path=workbook_path)
+            timings.append(time.perf_counter() - start)
+        counters.append(results)
+    return timings, counters, table_rows(engine)
+
+
+def main(school_count: int) -> None:
+    engine = make_engine()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        workbook_path = os.path.join(tmp_dir, "admissions.xlsx")
+        write_admissions_workbook(workbook_path, school_count)
+        reports = {
+            importer.__name__: run(engine, importer, workbook_path)
+            for importer in [save_file_to_db, bulk_save_file_to_db]
+        }
+    reset_schema(engine)
+
+    print(f"{'importer':<22} {'pass':<9} {'rows':>7} {'s':>8} {'rows/s':>8}")
+    for name, (timings, counters, _) in reports.items():
+        for label, timing, results in zip(["new", "existing"], timings, counters):
+            rows = sum(_["new_saved"] + _["existing"] for _ in results.values())
+            print(
+                f"{name:<22} {label:<9} {rows:>7} {timing:>8.2f} {rows / timing:>8.0f}"
+            )
+    (_, old_counters, old_rows), (_, new_counters, new_rows) = reports.values()
+    print(
+        f"same counters: {old_counters == new_counters}, same rows: {old_rows == new_rows}"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else SCHOOL_COUNT)
@@ -0,0 +1,106 @@
+"""
+/analyze latency and import throughput without and with the natural key constraints
+and filter indexes declared on the models
+
+Seeds the scratch database, drops the indexes and unique constraints, measures, then
+creates them again and measures once more.
+
+    BENCH_DATABASE_URL=... poetry run python -m benchmarks.bench_indexes [school count]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from sqlalchemy import UniqueConstraint, text
+from sqlalchemy.schema import AddConstraint, DropConstraint
+from benchmarks.common import (
+    make_engine,
+    reset_schema,
+    seed,
+    timed,
+    write_admissions_workbook,
+)
+from benchmarks.legacy import by_school_rate_per_school
+from app.analyze_data import by_campus_rate, by_school_rate
+from app.import_data import save_file_to_db
+from app.models import CountBySchool, HighSchool, HSPopulation, SchoolYearRollup
+
+SCHOOL_COUNT = 200
+WORKBOOK_SCHOOL_COUNT = 20
+TABLES = [
+    t.__table__ for t in [CountBySchool, HighSchool, HSPopulation, SchoolYearRollup]
+]
+ANALYZE_CALLS = {
+    "campus": lambda: by_campus_rate(),
+    "school all p1": lambda: by_school_rate(select_campus="all"),
+    "school ucla/2022/public": lambda: by_school_rate(
+        select_campus="ucla", select_year="2022", select_school_type="public"
+    ),
+    # the per school reference implementation issues one lookup per school and year
+    "school all p1, per school": lambda: by_school_rate_per_school(select_campus="all"),
+}
+
+
+def set_indexes(engine, enabled: bool) -> None:
+    with engine.begin() as conn:
+        for table in TABLES:
+            for index in table.indexes:
+                if enabled:
+                    index.create(conn, checkfirst=True)
+                else:
+                    index.drop(conn, checkfirst=True)
+            for constraint in table.constraints:
+                if not isinstance(constraint, UniqueConstraint):
+                    continue
+                conn.execute(
+                    AddConstraint(constraint) if enabled else DropConstraint(constraint)
+                )
+        for table in TABLES:
+            conn.execute(text(f"ANALYZE {table.name}"))
+
+
+def measure(label: str, workbook_path: str) -> None:
+    with contextlib.redirect_stdout(io.StringIO()):
+        latencies = {
+            name: timed(call, repeat=1)[0] for name, call in ANALYZE_CALLS.items()
+        }
+        start = time.perf_counter()
+        results = save_file_to_db(file_path=workbook_path)
+        import_time = time.perf_counter() - start
+    rows = sum(_["new_saved"] + _["existing"] for _ in results.values())
+    print(f"--- {label}")
+    for name, latency in latencies.items():
+        print(f"  /analyze {name:<26} {latency:>8.3f} s")
+    print(
+        f"  import {rows} rows in {import_time:.2f} s ({rows / import_time:.0f} rows/s)"
+    )
+
+
+def main(school_count: int) -> None:
+    engine = make_engine()
+    reset_schema(engine)
+    seed(engine, school_count)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        workbook_path = os.path.join(tmp_dir, "admissions.xlsx")
+        write_admissions_workbook(workbook_path, WORKBOOK_SCHOOL_COUNT)
+
+        set_indexes(engine, enabled=False)
+        measure("without indexes", workbook_path)
+        # the first import created the rows, drop them so both runs insert
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    "DELETE FROM count_by_schools c USING high_schools h "
+                    "WHERE h.id = c.school_id AND h.name LIKE 'WORKBOOK%'"
+                )
+            )
+        set_indexes(engine, enabled=True)
+        measure("with indexes", workbook_path)
+    reset_schema(engine)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else SCHOOL_COUNT)
@@ -0,0 +1,70 @@
+"""
+by_school_rate: "individual" campus mode vs. the aggregated "all" mode
+
+Seeds a growing number of schools and reports statements and time of one page and of
+all schools in both modes, and whether every campus of the "individual" results matches
+by_school_rate for that campus alone.
+
+    BENCH_DATABASE_URL=... poetry run python -m benchmarks.bench_individual_campus
+"""
+
+import sys
+from benchmarks.common import (
+    CAMPUSES,
+    count_queries,
+    make_engine,
+    reset_schema,
+    seed,
+    timed,
+)
+from app.analyze_data import by_school_rate
+
+SCHOOL_COUNTS = [100, 400, 1600]
+ROWS = {"page": {"offset": 0, "limit": 10}, "all": {"offset": 0, "limit": 10**9}}
+
+
+def same_as_per_campus(individual: dict) -> bool:
+    for campus in CAMPUSES:
+        for school, school_res in by_school_rate(
+            select_campus=campus, **ROWS["all"]
+        ).items():
+            for year, year_res in school_res.items():
+                if year == "school_info":
+                    continue
+                individual_year = individual.get(school, {}).get(year, {})
+                if individual_year.get("student_demo") != year_res["student_demo"]:
+                    return False
+                del year_res["student_demo"]
+                if individual_year.get(campus) != year_res:
+                    return False
+    return True
+
+
+def main(school_counts: list[int]) -> None:
+    engine = make_engine()
+    print(
+        f"{'schools':>8} {'rows':<5} {'all queries':>12} {'all s':>8} "
+        f"{'indiv queries':>14} {'indiv s':>8} {'same':>5}"
+    )
+    for school_count in school_counts:
+        reset_schema(engine)
+        seed(engine, school_count)
+        for label, rows in ROWS.items():
+            with count_queries(engine) as all_counter:
+                by_school_rate(select_campus="all", **rows)
+            with count_queries(engine) as individual_counter:
+                individual = by_school_rate(select_campus="individual", **rows)
+            _, all_time = timed(lambda: by_school_rate(select_campus="all", **rows))
+            _, individual_time = timed(
+                lambda: by_school_rate(select_campus="individual", **rows)
+            )
+            same = same_as_per_campus(individual) if label == "all" else ""
+            print(
+                f"{school_count:>8} {label:<5} {all_counter['queries']:>12} {all_time:>8.3f} "
+                f"{individual_counter['queries']:>14} {individual_time:>8.3f} {str(same):>5}"
+            )
+    reset_schema(engine)
+
+
+if __name__ == "__main__":
+    main([int(_) for _ in sys.argv[1:]] or SCHOOL_COUNTS)
@@ -0,0 +1,70 @@
+"""
+latest population of every school: HighSchool.population (lazy loads, with selectinload)
+vs. aggregate.load_latest_populations
+
+Seeds a growing number of schools and reports statements and time to get the latest
+12th grade enrollment of all of them each way, and whether all ways agree.
+
+    BENCH_DATABASE_URL=... poetry run python -m benchmarks.bench_latest_population
+"""
+
+import sys
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from benchmarks.common import count_queries, make_engine, reset_schema, seed, timed
+from app.aggregate import load_latest_populations
+from app.database import session_factory
+from app.models import HighSchool
+
+SCHOOL_COUNTS = [100, 400, 1600]
+
+
+def lazy_loads() -> dict:
+    with session_factory() as session:
+        return {
+            school.id: school.population
+            for school in session.scalars(select(HighSchool))
+            if school.population
+        }
+
+
+def selectin() -> dict:
+    with session_factory() as session:
+        return {
+            school.id: school.population
+            for school in session.scalars(
+                select(HighSchool).options(selectinload(HighSchool.populations))
+            )
+            if school.population
+        }
+
+
+def one_statement() -> dict:
+    with session_factory() as session:
+        return load_latest_populations(session)
+
+
+def main(school_counts: list[int]) -> None:
+    engine = make_engine()
+    loaders = [lazy_loads, selectin, one_statement]
+    print(
+        f"{'schools':>8} "
+        + " ".join(f"{_.__name__ + ' q':>16} {_.__name__ + ' s':>16}" for _ in loaders)
+        + f" {'same':>5}"
+    )
+    for school_count in school_counts:
+        reset_schema(engine)
+        seed(engine, school_count)
+        row = f"{school_count:>8}"
+        results = []
+        for loader in loaders:
+            with count_queries(engine) as counter:
+                results.append(loader())
+            _, duration = timed(loader)
+            row += f" {counter['queries']:>16} {duration:>16.3f}"
+        print(row + f" {str(all(_ == results[0] for _ in results)):>5}")
+    reset_schema(engine)
+
+
+if __name__ == "__main__":
+    main([int(_) for _ in sys.argv[1:]] or SCHOOL_COUNTS)
@@ -0,0 +1,58 @@
+"""
+bulk admissions import with sheets parsed in a process pool
+
+Imports a generated workbook into an empty scratch database with 1, 2, 4 ... up to
+os.cpu_count() parsing workers and reports wall time, plus whether every run leaves the
+same rows and counters behind as the single process one.
+
+    BENCH_DATABASE_URL=... poetry run python -m benchmarks.bench_parallel_import [school count]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from benchmarks.bench_import import table_rows
+from benchmarks.common import make_engine, reset_schema, write_admissions_workbook
+from app.import_data import bulk_save_file_to_db
+
+SCHOOL_COUNT = 200
+
+
+def worker_counts() -> list[int]:
+    cpu_count = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cpu_count:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpu_count:
+        counts.append(cpu_count)
+    return counts
+
+
+def main(school_count: int) -> None:
+    engine = make_engine()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        workbook_path = os.path.join(tmp_dir, "admissions.xlsx")
+        write_admissions_workbook(workbook_path, school_count)
+        print(f"{'workers':>8} {'s':>8} {'speedup':>8} {'same':>5}")
+        baseline = None
+        for workers in worker_counts():
+            reset_schema(engine)
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                results = bulk_save_file_to_db(file_path=workbook_path, workers=workers)
+                duration = time.perf_counter() - start
+            outcome = (results, table_rows(engine))
+            if baseline is None:
+                baseline = (duration, outcome)
+            print(
+                f"{workers:>8} {duration:>8.2f} {baseline[0] / duration:>8.2f} "
+                f"{str(outcome == baseline[1]):>5}"
+            )
+    reset_schema(engine)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else SCHOOL_COUNT)
@@ -0,0 +1,62 @@
+"""
+admissions workbook parsing: pd.read_excel per sheet vs. one workbook for all sheets vs.
+the Arrow sheet cache
+
+Parses all 18 "{yr} {camp}" sheets of a generated workbook each way and reports wall
+time and peak python memory (tracemalloc). The cache is measured cold (parse and write
+the Arrow files) and warm (memory map them). No database needed.
+
+    poetry run python -m benchmarks.bench_read_workbook [school count]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from benchmarks.common import write_admissions_workbook
+from app import import_data
+from app.import_data import ADMISSION_SHEETS, iter_sheets, read_file_to_df
+
+SCHOOL_COUNT = 500
+
+
+def per_sheet(workbook_path: str) -> int:
+    rows = 0
+    for sheet_name in ADMISSION_SHEETS:
+        rows += len(read_file_to_df(file_path=workbook_path, sheet_name=sheet_name))
+    return rows
+
+
+def one_workbook(workbook_path: str) -> int:
+    rows = 0
+    for _, sheet_df in iter_sheets(workbook_path, list(ADMISSION_SHEETS)):
+        rows += len(sheet_df)
+    return rows
+
+
+def main(school_count: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        workbook_path = os.path.join(tmp_dir, "admissions.xlsx")
+        write_admissions_workbook(workbook_path, school_count)
+        size_mb = os.path.getsize(workbook_path) / 2**20
+        print(f"workbook: {school_count} schools, {size_mb:.1f} MB")
+        print(f"{'reader':<14} {'rows':>8} {'s':>8} {'peak MB':>8}")
+        for label, reader, cache_dir in [
+            ("per_sheet", per_sheet, ""),
+            ("one_workbook", one_workbook, ""),
+            ("cache cold", one_workbook, os.path.join(tmp_dir, "cache")),
+            ("cache warm", one_workbook, os.path.join(tmp_dir, "cache")),
+        ]:
+            import_data.SHEET_CACHE_DIR = cache_dir
+            tracemalloc.start()
+            start = time.perf_counter()
+            rows = reader(workbook_path)
+            duration = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{label:<14} {rows:>8} {duration:>8.2f} {peak / 2**20:>8.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else SCHOOL_COUNT)
@@ -0,0 +1,127 @@
+"""
+per school/year metrics: school_year_result row by row vs. the vectorized school_metrics
+
+Generates the per school/year counts of aggregate.load_school_counts for a growing
+number of rows, with missing Asian rows, missing student counts and zeros, and reports
+the time to turn all of them into results each way, and to rank the schools and build
+one page of results. Both ways must agree. No database needed.
+
+    poetry run python -m benchmarks.bench_school_metrics [row count ...]
+"""
+
+import itertools
+import random
+import sys
+import pandas as pd
+from benchmarks.common import timed
+from benchmarks.legacy import school_year_result
+from app.aggregate import (
+    COUNT_COLUMNS,
+    rank_school_metrics,
+    school_metrics,
+    school_results,
+)
+from app.analyze_data import sort_school_results
+
+ROW_COUNTS = [1_000, 10_000, 100_000]
+SORT_BY_YEAR = "2023"
+PAGE_SIZE = 10
+
+
+def make_counts(row_count: int, seed: int = 0) -> pd.DataFrame:
+    rnd = random.Random(seed)
+
+    def maybe(value, missing_rate=0.1):
+        return None if rnd.random() < missing_rate else value
+
+    rows = []
+    for i in range(row_count):
+        all_students = maybe(rnd.randint(0, 800), 0.2)
+        all_app = rnd.randint(1, 300)
+        all_adm = rnd.randint(1, all_app)
+        asian = rnd.random() > 0.15
+        rows.append(
+            {
+                "school": f"SCHOOL {i // 3:06d}",
+                "year": str(2023 - i % 3),
+                "all_rows": 6,
+                "all_app": all_app,
+                "all_adm": all_adm,
+                "all_enr": maybe(rnd.randint(0, all_adm)),
+                "all_students": all_students,
+                "asian_app": rnd.randint(0, all_app) if asian else None,
+                "asian_adm": rnd.randint(0, all_adm) if asian else None,
+                "asian_enr": maybe(rnd.randint(0, all_adm)) if asian else None,
+                "asian_students": (
+                    maybe(rnd.randint(0, all_students or 1)) if asian else None
+                ),
+            }
+        )
+    counts = pd.DataFrame(rows)
+    counts[COUNT_COLUMNS] = counts[COUNT_COLUMNS].astype(float)
+    return counts
+
+
+def row_by_row(records: list[dict]) -> dict:
+    results = {}
+    for r in records:
+        year_res = school_year_result(
+            {"App": r["all_app"], "Adm": r["all_adm"], "Enr": r["all_enr"]},
+            {"App": r["asian_app"], "Adm": r["asian_adm"], "Enr": r["asian_enr"]},
+            r["all_students"],
+            r["asian_students"],
+        )
+        results.setdefault(r["school"], {"school_info": None})[r["year"]] = year_res
+    return results
+
+
+def row_by_row_page(records: list[dict]) -> dict:
+    results = sort_school_results(row_by_row(records), SORT_BY_YEAR)
+    return dict(itertools.islice(results.items(), PAGE_SIZE))
+
+
+def vectorized(counts: pd.DataFrame) -> dict:
+    return school_results(school_metrics(counts), {})
+
+
+def vectorized_page(counts: pd.DataFrame) -> dict:
+    metrics = school_metrics(counts)
+    page_schools = rank_school_metrics(metrics, SORT_BY_YEAR)[:PAGE_SIZE]
+    results = school_results(metrics[metrics["school"].isin(page_schools)], {})
+    return {school: results[school] for school in page_schools}
+
+
+def main(row_counts: list[int]) -> None:
+    print(
+        f"{'rows':>8} {'results':<8} {'row_by_row s':>13} {'vectorized s':>13} "
+        f"{'speedup':>8} {'same':>5}"
+    )
+    for row_count in row_counts:
+        counts = make_counts(row_count)
+        # the rows as load_school_counts used to hand them out, ints and None
+        records = [
+            {
+                key: (
+                    (None if value != value else int(value))
+                    if key in COUNT_COLUMNS
+                    else value
+                )
+                for key, value in record.items()
+            }
+            for record in counts.to_dict("records")
+        ]
+        for label, old, new in [
+            ("all", row_by_row, vectorized),
+            ("page", row_by_row_page, vectorized_page),
+        ]:
+            same = old(records) == new(counts)
+            old_time, _ = timed(lambda: old(records))
+            new_time, _ = timed(lambda: new(counts))
+            print(
+                f"{row_count:>8} {label:<8} {old_time:>13.3f} {new_time:>13.3f} "
+                f"{old_time / new_time:>8.1f} {str(same):>5}"
+            )
+
+
+if __name__ == "__main__":
+    main([int(_) for _ in sys.argv[1:]] or ROW_COUNTS)
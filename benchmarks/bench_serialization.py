@@ -0,0 +1,82 @@
+"""
+/analyze response encoding: FastAPI's jsonable_encoder walk + json vs. responses.encode_json
+
+Builds by_school_rate results of a growing number of schools, aggregated ("all") and by
+campus ("individual"), and reports the time to encode them the way FastAPI encodes a
+returned dict, with encode_json on the stdlib json fallback and with orjson. The
+cached case costs nothing to encode, the cache holds the bytes. All bodies must parse
+to the same results. No database needed.
+
+    poetry run python -m benchmarks.bench_serialization [school count ...]
+"""
+
+import json
+import sys
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from benchmarks.bench_school_metrics import make_counts
+from benchmarks.common import CAMPUSES, timed
+from app import responses
+from app.aggregate import school_metrics, school_results
+
+SCHOOL_COUNTS = [10, 100, 1_000]
+
+
+def school_rates(school_count: int, by_campus: bool) -> dict:
+    # make_counts has 3 years per school
+    if not by_campus:
+        return school_results(school_metrics(make_counts(school_count * 3)), {})
+    counts = pd.concat(
+        [
+            make_counts(school_count * 3, seed=i).assign(campus=campus)
+            for i, campus in enumerate(CAMPUSES)
+        ]
+    ).sort_values(["school", "year", "campus"], ignore_index=True)
+    return school_results(school_metrics(counts), {})
+
+
+def fastapi_default(results: dict) -> bytes:
+    return JSONResponse(jsonable_encoder(results)).body
+
+
+def stdlib_json(results: dict) -> bytes:
+    orjson, responses.orjson = responses.orjson, None
+    try:
+        return responses.encode_json(results)
+    finally:
+        responses.orjson = orjson
+
+
+def orjson(results: dict) -> bytes:
+    return responses.encode_json(results)
+
+
+def main(school_counts: list[int]) -> None:
+    encoders = [fastapi_default, stdlib_json]
+    if responses.orjson is not None:
+        encoders.append(orjson)
+    else:
+        print("orjson is not installed, poetry install -E fast")
+    print(
+        f"{'schools':>8} {'campus':<11} {'KB':>8} "
+        + " ".join(f"{_.__name__ + ' s':>17}" for _ in encoders)
+        + f" {'same':>5}"
+    )
+    for school_count in school_counts:
+        for by_campus in [False, True]:
+            results = school_rates(school_count, by_campus)
+            bodies = [encoder(results) for encoder in encoders]
+            same = all(json.loads(_) == json.loads(bodies[0]) for _ in bodies)
+            row = (
+                f"{school_count:>8} {'individual' if by_campus else 'all':<11} "
+                f"{len(bodies[0]) / 1024:>8.0f}"
+            )
+            for encoder in encoders:
+                _, duration = timed(lambda: encoder(results))
+                row += f" {duration:>17.4f}"
+            print(row + f" {str(same):>5}")
+
+
+if __name__ == "__main__":
+    main([int(_) for _ in sys.argv[1:]] or SCHOOL_COUNTS)
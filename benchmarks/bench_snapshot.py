@@ -0,0 +1,67 @@
+"""
+/analyze from Postgres vs. from the memory-mapped analytics snapshot
+
+Seeds a growing number of schools, publishes the snapshot into a temporary directory
+and reports statements and time of by_campus_rate and of a by_school_rate page each way,
+the snapshot size, and whether both ways return the same results.
+
+    BENCH_DATABASE_URL=... poetry run python -m benchmarks.bench_snapshot
+"""
+
+import os
+import sys
+import tempfile
+from benchmarks.common import count_queries, make_engine, reset_schema, seed, timed
+from app import snapshot
+from app.analyze_data import by_campus_rate, by_school_rate
+
+SCHOOL_COUNTS = [100, 400, 1600]
+CASES = {
+    "campus": (by_campus_rate, snapshot.snapshot_campus_rates, {}),
+    "all": (by_school_rate, snapshot.snapshot_school_rates, {"select_campus": "all"}),
+    "individual": (
+        by_school_rate,
+        snapshot.snapshot_school_rates,
+        {"select_campus": "individual"},
+    ),
+    "ucla public": (
+        by_school_rate,
+        snapshot.snapshot_school_rates,
+        {"select_campus": "ucla", "select_school_type": "public"},
+    ),
+}
+
+
+def main(school_counts: list[int]) -> None:
+    engine = make_engine()
+    print(
+        f"{'schools':>8} {'KB':>6} {'case':<12} {'db queries':>11} {'db s':>8} "
+        f"{'snapshot queries':>17} {'snapshot s':>11} {'same':>5}"
+    )
+    for school_count in school_counts:
+        reset_schema(engine)
+        seed(engine, school_count)
+        # the seeded data has no data version, a new directory per size
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot.analytics_snapshots = snapshot.SnapshotStore(directory)
+            path = snapshot.publish_snapshot(directory)
+            size = sum(os.path.getsize(os.path.join(path, _)) for _ in os.listdir(path))
+            snapshot.analytics_snapshots.current()
+            for case, (from_db, from_snapshot, params) in CASES.items():
+                with count_queries(engine) as db_counter:
+                    expected = from_db(**params)
+                with count_queries(engine) as snapshot_counter:
+                    actual = from_snapshot(**params)
+                _, db_time = timed(lambda: from_db(**params))
+                _, snapshot_time = timed(lambda: from_snapshot(**params))
+                print(
+                    f"{school_count:>8} {size / 1024:>6.0f} {case:<12} "
+                    f"{db_counter['queries']:>11} {db_time:>8.3f} "
+                    f"{snapshot_counter['queries']:>17} {snapshot_time:>11.3f} "
+                    f"{str(expected == actual):>5}"
+                )
+    reset_schema(engine)
+
+
+if __name__ == "__main__":
+    main([int(_) for _ in sys.argv[1:]] or SCHOOL_COUNTS)
@@ -0,0 +1,112 @@
+"""
+replacing the counts of a year: row level DELETE + INSERT or upsert vs. partition swap
+
+Seeds a growing number of schools, then replaces every count of the first year with
+new numbers each way, on a freshly seeded database each time. Reports the time until
+commit, the size of the year's partition afterwards (dead rows included), whether all
+ways leave the same rows behind, and how many partitions a rollup refresh of that year
+reads.
+
+    BENCH_DATABASE_URL=... poetry run python -m benchmarks.bench_year_replace
+"""
+
+import sys
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from benchmarks.common import YEARS, make_engine, reset_schema, seed, timed
+from app.database import session_factory
+from app.models import CountBySchool
+from app.partitions import partition_name, replace_year_partition
+from app.rollup import rollup_insert
+
+SCHOOL_COUNTS = [400, 1600]
+YEAR = int(YEARS[0])
+KEY = [
+    CountBySchool.school_id,
+    CountBySchool.year,
+    CountBySchool.campus_id,
+    CountBySchool.race_id,
+    CountBySchool.count_type,
+]
+
+
+def delete_insert(session, rows: list[dict]) -> None:
+    session.execute(delete(CountBySchool).filter(CountBySchool.year == YEAR))
+    session.execute(insert(CountBySchool), rows)
+
+
+def upsert(session, rows: list[dict]) -> None:
+    stmt = pg_insert(CountBySchool)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_count_by_schools_natural_key",
+        set_={"count": stmt.excluded.count},
+    )
+    session.execute(stmt, rows)
+
+
+def swap(session, rows: list[dict]) -> None:
+    replace_year_partition(session, YEAR, rows)
+
+
+def replacement_rows(engine) -> list[dict]:
+    with engine.connect() as conn:
+        found = conn.execute(
+            select(*KEY, CountBySchool.count).filter(CountBySchool.year == YEAR)
+        ).all()
+    return [
+        dict(zip([_.name for _ in KEY] + ["count"], [*key, count + 1]))
+        for *key, count in found
+    ]
+
+
+def scanned_partitions(engine) -> int:
+    sql = str(
+        rollup_insert(years=[str(YEAR)]).select.compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    )
+    with engine.connect() as conn:
+        plan = conn.execute(text(f"EXPLAIN {sql}")).scalars().all()
+    return sum(f"Scan on {CountBySchool.__tablename__}_" in _ for _ in plan)
+
+
+def main(school_counts: list[int]) -> None:
+    engine = make_engine()
+    print(
+        f"{'schools':>8} {'way':<14} {'rows':>7} {'s':>7} {'partition KB':>13} "
+        f"{'same':>5} {'scanned':>8}"
+    )
+    for school_count in school_counts:
+        results = []
+        for way in [delete_insert, upsert, swap]:
+            reset_schema(engine)
+            seed(engine, school_count)
+            rows = replacement_rows(engine)
+
+            def replace():
+                with session_factory() as session:
+                    way(session, rows)
+                    session.commit()
+
+            duration, _ = timed(replace, repeat=1)
+            with engine.connect() as conn:
+                size = conn.scalar(
+                    text(
+                        "SELECT pg_total_relation_size("
+                        f"'{partition_name(YEAR)}'::regclass)"
+                    )
+                )
+                results.append(
+                    conn.execute(select(*KEY, CountBySchool.count).order_by(*KEY)).all()
+                )
+            print(
+                f"{school_count:>8} {way.__name__:<14} {len(rows):>7} "
+                f"{duration:>7.3f} {size / 1024:>13.0f} "
+                f"{str(results[-1] == results[0]):>5} {scanned_partitions(engine):>8}"
+            )
+    reset_schema(engine)
+
+
+if __name__ == "__main__":
+    main([int(_) for _ in sys.argv[1:]] or SCHOOL_COUNTS)
@@ -0,0 +1,369 @@
+"""
+reference implementations the benchmarks check the app against
+
+The analysis used to query each school and year separately, these are those code paths
+kept for benchmarks.bench_by_school_rate and benchmarks.bench_school_metrics to compare
+results and statement counts with.
+"""
+
+import itertools
+import logging
+from collections import Counter
+from sqlalchemy import func
+from app.analyze_data import sort_school_results
+from app.database import session_factory
+from app.models import Campus, CountBySchool, HighSchool, HSPopulation, Race
+from app.schemas import SchoolRates
+
+logger = logging.getLogger(__name__)
+
+
+def by_school_rate_per_school(
+    select_campus: str = "all",
+    select_year: str | int = "all",
+    select_school_type: str = "all",
+    offset: int = 0,
+    limit: int = 10,
+) -> SchoolRates:
+    """
+    app.analyze_data.by_school_rate querying each school and year separately, for
+    select_campus "all" or a campus name.
+    """
+    with session_factory() as session:
+        all_schools_queryset = session.query(HighSchool.name).join(
+            CountBySchool, CountBySchool.school_id == HighSchool.id
+        )
+        if select_school_type in ["public", "private"]:
+            all_schools_queryset = all_schools_queryset.filter(
+                HighSchool.category == select_school_type
+            )
+
+        all_schools = [_.name for _ in all_schools_queryset.distinct().all()]
+        logger.debug(
+            "Found %d distinct schools for type %s: %s",
+            len(all_schools),
+            select_school_type,
+            all_schools,
+        )
+
+        all_years_queryset = session.query(CountBySchool.year).distinct().all()
+        all_years = [str(_.year) for _ in all_years_queryset]
+        logger.debug("Found distinct years: %s", all_years)
+
+        loop_years = all_years
+        if select_year != "all":
+            if str(select_year) in all_years:
+                loop_years = [str(select_year)]
+
+        sort_by_year = str(max([int(_) for _ in loop_years]))
+
+        logger.debug("Loop data for years: %s", loop_years)
+
+        all_campuses_queryset = (
+            session.query(Campus.name)
+            .join(CountBySchool, CountBySchool.campus_id == Campus.id)
+            .distinct()
+            .all()
+        )
+        all_campuses = [_.name for _ in all_campuses_queryset]
+        logger.debug("Found distinct campuses: %s", all_campuses)
+
+        results = {}
+        skipped_school_count = 0
+        all_school_count = 0
+        # skipped school/years by reason
+        skipped_years = Counter()
+        for school in all_schools:
+            all_school_count += 1
+            school_res = {}
+            for year in loop_years:
+                # get school info
+                school_obj = (
+                    session.query(HighSchool.category, HighSchool.name, HighSchool.city)
+                    .filter(HighSchool.name == school)
+                    .first()
+                )
+                school_info = school_obj._asdict()
+
+                # get student demographics data
+                # get the high school 12th grade enrollment population, without sub
+                # races (Filipino is also counted as Asian), like the rollups
+                hs_enr_data = (
+                    session.query(HSPopulation.race, HSPopulation.count)
+                    .join(HighSchool, HighSchool.id == HSPopulation.school_id)
+                    .filter(
+                        HighSchool.name == school,
+                        HSPopulation.count_type == "hs_enr",
+                        HSPopulation.year == year,
+                        HSPopulation.sub_race.is_(None),
+                    )
+                    .all()
+                )
+                all_enr_count = None
+                asian_enr_count = None
+                if hs_enr_data:
+                    all_enr_count = [_.count for _ in hs_enr_data if _.race == "All"]
+                    all_enr_count = all_enr_count[0] if all_enr_count else None
+                    asian_enr_count = [
+                        _.count for _ in hs_enr_data if _.race == "Asian"
+                    ]
+                    asian_enr_count = asian_enr_count[0] if asian_enr_count else None
+
+                student_demo = {
+                    "all_student_count": all_enr_count,
+                    "asian_student_count": asian_enr_count,
+                    "asian_student_percentage": (
+                        asian_enr_count / all_enr_count
+                        if (asian_enr_count and all_enr_count)
+                        else 0
+                    ),
+                }
+
+                # get admission/application rate
+                filter_clause = [
+                    CountBySchool.year == int(year),
+                    HighSchool.name == school,
+                    Race.name == "All",
+                ]
+                filter_clause_2 = [
+                    CountBySchool.year == int(year),
+                    HighSchool.name == school,
+                    Race.name == "Asian",
+                ]
+                if select_campus != "all":
+                    # specified a campus name
+                    filter_clause.append(Campus.name == select_campus)
+                    filter_clause_2.append(Campus.name == select_campus)
+
+                count_query = (
+                    session.query(
+                        CountBySchool.count_type, func.sum(CountBySchool.count)
+                    )
+                    .join(HighSchool, HighSchool.id == CountBySchool.school_id)
+                    .join(Campus, Campus.id == CountBySchool.campus_id)
+                    .join(Race, Race.id == CountBySchool.race_id)
+                )
+                count_data = (
+                    count_query.filter(*filter_clause)
+                    .group_by(CountBySchool.count_type)
+                    .all()
+                )
+
+                if not count_data:
+                    skipped_years["no count data"] += 1
+                    logger.debug("No count_data for %s/%s", school, year)
+                    continue
+
+                app_count = [_[1] for _ in count_data if _[0] == "App"][0]
+                adm_count = [_[1] for _ in count_data if _[0] == "Adm"][0]
+                enr_count = [_[1] for _ in count_data if _[0] == "Enr"]
+                enr_count = enr_count[0] if enr_count else None
+
+                asian_count_data = (
+                    count_query.filter(*filter_clause_2)
+                    .group_by(CountBySchool.count_type)
+                    .all()
+                )
+                asian_app_count = [_[1] for _ in asian_count_data if _[0] == "App"][0]
+                asian_adm_count = [_[1] for _ in asian_count_data if _[0] == "Adm"][0]
+                asian_uc_enr_count = [_[1] for _ in asian_count_data if _[0] == "Enr"]
+                asian_uc_enr_count = (
+                    asian_uc_enr_count[0] if asian_uc_enr_count else None
+                )
+
+                # get application/total student percentage
+                app_student_data = {}
+                app_student_data["all_app_all_student"] = (
+                    app_count / all_enr_count if all_enr_count else None
+                )
+                app_student_data["asian_app_asian_student"] = (
+                    asian_app_count / asian_enr_count
+                    if (asian_app_count and asian_enr_count)
+                    else 0
+                )
+                app_student_data["asian_app_all_student"] = (
+                    asian_app_count / all_enr_count
+                    if (asian_app_count and all_enr_count)
+                    else 0
+                )
+                app_student_data["all_adm_all_student"] = (
+                    adm_count / all_enr_count if all_enr_count else None
+                )
+                app_student_data["asian_adm_asian_student"] = (
+                    asian_adm_count / asian_enr_count
+                    if (asian_adm_count and asian_enr_count)
+                    else 0
+                )
+                app_student_data["asian_adm_all_student"] = (
+                    asian_adm_count / all_enr_count
+                    if (asian_adm_count and all_enr_count)
+                    else 0
+                )
+
+                # get campus enrollment/admission percentage
+                # the lower the enrollment/admission percentage, the larger chance that the student
+                # land on a better university.
+                enr_adm_data = {}
+                enr_adm_data["all_enr_count"] = enr_count
+                enr_adm_data["asian_enr_count"] = asian_uc_enr_count
+                enr_adm_data["all_enr_all_adm"] = (
+                    enr_count / adm_count if (adm_count and enr_count) else None
+                )
+                enr_adm_data["asian_enr_asian_adm"] = (
+                    asian_uc_enr_count / asian_adm_count
+                    if (asian_adm_count and asian_uc_enr_count)
+                    else None
+                )
+                enr_adm_data["asian_enr_all_adm"] = (
+                    asian_uc_enr_count / adm_count
+                    if (adm_count and asian_uc_enr_count)
+                    else None
+                )
+
+                if not adm_count and not asian_adm_count:
+                    skipped_years["no admissions"] += 1
+                    logger.debug(
+                        "Skip school for year because admission rate is 0 or no data: %s/%s",
+                        school,
+                        year,
+                    )
+                    continue
+                school_res[year] = {
+                    "student_demo": student_demo,
+                    "application/student": app_student_data,
+                    "admission/application": {
+                        "all_app": app_count,
+                        "all_adm": adm_count,
+                        "all_percentage": (
+                            adm_count / app_count if app_count else None
+                        ),
+                        "asian_app": asian_app_count,
+                        "asian_adm": asian_adm_count,
+                        "asian_percentage": (
+                            asian_adm_count / asian_app_count
+                            if asian_app_count
+                            else None
+                        ),
+                    },
+                    "enrollment/admission": enr_adm_data,
+                }
+
+            if school_res:
+                # sort by most recent year
+                sorted_school_res = dict(sorted(school_res.items(), reverse=True))
+                results[school] = {"school_info": school_info, **sorted_school_res}
+            else:
+                skipped_school_count += 1
+                logger.debug(
+                    "Skip school because admission rate is 0 or no data: %s", school
+                )
+
+        logger.info(
+            "Total %d schools found and skipped %d, skipped school/years: %s",
+            all_school_count,
+            skipped_school_count,
+            dict(skipped_years),
+        )
+
+        results = sort_school_results(results, sort_by_year)
+        sliced_dict = dict(
+            itertools.islice(results.items(), offset, (offset + limit), 1)
+        )
+        return sliced_dict
+
+
+def school_year_result(
+    all_counts: dict,
+    asian_counts: dict,
+    all_enr_count: int | None,
+    asian_enr_count: int | None,
+) -> dict | None:
+    """
+    Metrics for one school and year, or None when the school had no admissions that year,
+    app.aggregate.school_metrics computes them for all schools and years at once.
+    """
+    app_count = all_counts.get("App")
+    adm_count = all_counts.get("Adm")
+    enr_count = all_counts.get("Enr")
+    asian_app_count = asian_counts.get("App")
+    asian_adm_count = asian_counts.get("Adm")
+    asian_uc_enr_count = asian_counts.get("Enr")
+
+    if not adm_count and not asian_adm_count:
+        return None
+
+    student_demo = {
+        "all_student_count": all_enr_count,
+        "asian_student_count": asian_enr_count,
+        "asian_student_percentage": (
+            asian_enr_count / all_enr_count
+            if (asian_enr_count and all_enr_count)
+            else 0
+        ),
+    }
+    app_student_data = {
+        "all_app_all_student": (
+            app_count / all_enr_count
+            if (app_count is not None and all_enr_count)
+            else None
+        ),
+        "asian_app_asian_student": (
+            asian_app_count / asian_enr_count
+            if (asian_app_count and asian_enr_count)
+            else 0
+        ),
+        "asian_app_all_student": (
+            asian_app_count / all_enr_count
+            if (asian_app_count and all_enr_count)
+            else 0
+        ),
+        "all_adm_all_student": (
+            adm_count / all_enr_count
+            if (adm_count is not None and all_enr_count)
+            else None
+        ),
+        "asian_adm_asian_student": (
+            asian_adm_count / asian_enr_count
+            if (asian_adm_count and asian_enr_count)
+            else 0
+        ),
+        "asian_adm_all_student": (
+            asian_adm_count / all_enr_count
+            if (asian_adm_count and all_enr_count)
+            else 0
+        ),
+    }
+    # the lower the enrollment/admission percentage, the larger chance that the student
+    # land on a better university.
+    enr_adm_data = {
+        "all_enr_count": enr_count,
+        "asian_enr_count": asian_uc_enr_count,
+        "all_enr_all_adm": (
+            enr_count / adm_count if (adm_count and enr_count) else None
+        ),
+        "asian_enr_asian_adm": (
+            asian_uc_enr_count / asian_adm_count
+            if (asian_adm_count and asian_uc_enr_count)
+            else None
+        ),
+        "asian_enr_all_adm": (
+            asian_uc_enr_count / adm_count
+            if (adm_count and asian_uc_enr_count)
+            else None
+        ),
+    }
+    return {
+        "student_demo": student_demo,
+        "application/student": app_student_data,
+        "admission/application": {
+            "all_app": app_count,
+            "all_adm": adm_count,
+            "all_percentage": adm_count / app_count if app_count else None,
+            "asian_app": asian_app_count,
+            "asian_adm": asian_adm_count,
+            "asian_percentage": (
+                asian_adm_count / asian_app_count if asian_app_count else None
+            ),
+        },
+        "enrollment/admission": enr_adm_data,
+    }
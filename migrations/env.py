@@ -1,5 +1,6 @@
 from logging.config import fileConfig
 from app.models import Base
+from app.partitions import PARTITION_NAME
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
@@ -18,6 +19,12 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 target_metadata = Base.metadata
 
+
+def include_name(name, type_, parent_names) -> bool:
+    # the year partitions of count_by_schools are managed by app.partitions
+    return not (type_ == "table" and PARTITION_NAME.fullmatch(name))
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -40,6 +47,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -62,7 +70,11 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,105 @@
+"""add natural keys and filter indexes
+
+Revision ID: 6d1e604ca5e1
+Revises: 7fcd51f50157
+Create Date: 2026-10-18 15:00:41.203177
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d1e604ca5e1'
+down_revision: Union[str, None] = '7fcd51f50157'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# same as the backfill in 7fcd51f50157
+REBUILD_ROLLUPS = """
+    TRUNCATE school_year_rollups;
+    INSERT INTO school_year_rollups
+        (school_id, year, campus, race, app_count, adm_count, enr_count, student_count)
+    SELECT
+        c.school_id,
+        c.year,
+        c.campus,
+        c.race,
+        sum(c.count) FILTER (WHERE c.count_type = 'App'),
+        sum(c.count) FILTER (WHERE c.count_type = 'Adm'),
+        sum(c.count) FILTER (WHERE c.count_type = 'Enr'),
+        max(p.count)
+    FROM count_by_schools c
+    LEFT JOIN (
+        SELECT
+            school_id,
+            year,
+            race,
+            count,
+            row_number() OVER (
+                PARTITION BY school_id, year, race ORDER BY sub_race IS NOT NULL, id
+            ) AS row_number
+        FROM hs_populations
+        WHERE count_type = 'hs_enr'
+    ) p ON p.school_id = c.school_id
+        AND p.year = c.year
+        AND p.race = c.race
+        AND p.row_number = 1
+    WHERE c.school_id IS NOT NULL
+    GROUP BY c.school_id, c.year, c.campus, c.race
+"""
+
+
+def upgrade() -> None:
+    # The importer used to dedupe count_by_schools on the count too, so re-importing a
+    # sheet with changed numbers added a second row. Keep the latest one.
+    op.execute(
+        """
+        DELETE FROM count_by_schools c
+        USING count_by_schools newer
+        WHERE newer.year = c.year
+            AND newer.campus = c.campus
+            AND newer.city = c.city
+            AND newer.school = c.school
+            AND newer.race = c.race
+            AND newer.count_type = c.count_type
+            AND newer.id > c.id
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM hs_populations p
+        USING hs_populations newer
+        WHERE newer.school_id IS NOT DISTINCT FROM p.school_id
+            AND newer.year = p.year
+            AND newer.race = p.race
+            AND newer.sub_race IS NOT DISTINCT FROM p.sub_race
+            AND newer.count_type = p.count_type
+            AND newer.id > p.id
+        """
+    )
+    op.execute(REBUILD_ROLLUPS)
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_index('ix_count_by_schools_school_id_year_campus', 'count_by_schools', ['school_id', 'year', 'campus'], unique=False, postgresql_include=['race', 'count_type', 'count'])
+    op.create_index('ix_count_by_schools_school_year_race', 'count_by_schools', ['school', 'year', 'race', 'count_type'], unique=False, postgresql_include=['campus', 'count'])
+    op.create_unique_constraint('uq_count_by_schools_natural_key', 'count_by_schools', ['year', 'campus', 'city', 'school', 'race', 'count_type'])
+    op.create_unique_constraint('uq_high_schools_city_name', 'high_schools', ['city', 'name'], postgresql_nulls_not_distinct=True)
+    op.create_index('ix_hs_populations_count_type_year_race', 'hs_populations', ['count_type', 'year', 'race'], unique=False, postgresql_include=['school_id', 'sub_race', 'count'])
+    op.create_unique_constraint('uq_hs_populations_natural_key', 'hs_populations', ['school_id', 'year', 'race', 'sub_race', 'count_type'], postgresql_nulls_not_distinct=True)
+    op.create_index('ix_school_year_rollups_year_race_campus', 'school_year_rollups', ['year', 'race', 'campus'], unique=False)
+    # ### end Alembic commands ###
+
+
+def downgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_index('ix_school_year_rollups_year_race_campus', table_name='school_year_rollups')
+    op.drop_constraint('uq_hs_populations_natural_key', 'hs_populations', type_='unique')
+    op.drop_index('ix_hs_populations_count_type_year_race', table_name='hs_populations')
+    op.drop_constraint('uq_high_schools_city_name', 'high_schools', type_='unique')
+    op.drop_constraint('uq_count_by_schools_natural_key', 'count_by_schools', type_='unique')
+    op.drop_index('ix_count_by_schools_school_year_race', table_name='count_by_schools', postgresql_include=['campus', 'count'])
+    op.drop_index('ix_count_by_schools_school_id_year_campus', table_name='count_by_schools', postgresql_include=['race', 'count_type', 'count'])
+    # ### end Alembic commands ###
@@ -0,0 +1,78 @@
+"""partition count_by_schools by year
+
+Revision ID: c31a28559298
+Revises: c10cfd6c3b12
+Create Date: 2026-10-18 18:00:37.204816
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c31a28559298'
+down_revision: Union[str, None] = 'c10cfd6c3b12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# created by c10cfd6c3b12
+count_type = postgresql.ENUM('App', 'Adm', 'Enr', name='admission_count_type', create_type=False)
+
+
+def create_count_by_schools_new(partition_by: str | None) -> None:
+    primary_key = ['id', 'year'] if partition_by else ['id']
+    op.create_table('count_by_schools_new',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('school_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('count_type', count_type, nullable=False),
+    sa.Column('year', sa.SmallInteger(), nullable=False),
+    sa.Column('campus_id', sa.SmallInteger(), nullable=False),
+    sa.Column('race_id', sa.SmallInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['campus_id'], ['campuses.id'], name='count_by_schools_campus_id_fkey'),
+    sa.ForeignKeyConstraint(['race_id'], ['races.id'], name='count_by_schools_race_id_fkey'),
+    sa.ForeignKeyConstraint(['school_id'], ['high_schools.id'], name='count_by_schools_school_id_fkey'),
+    sa.PrimaryKeyConstraint(*primary_key, name='count_by_schools_new_pkey'),
+    postgresql_partition_by=partition_by
+    )
+
+
+def swap_count_by_schools_new() -> None:
+    # the ids carry over, so does the next one
+    op.execute(
+        """
+        INSERT INTO count_by_schools_new
+            (id, school_id, count, count_type, year, campus_id, race_id)
+        SELECT id, school_id, count, count_type, year, campus_id, race_id
+        FROM count_by_schools
+        ORDER BY school_id, year, campus_id, race_id, count_type
+        """
+    )
+    op.execute(
+        "SELECT setval('count_by_schools_new_id_seq', coalesce(max(id), 0) + 1, false)"
+        " FROM count_by_schools_new"
+    )
+    op.drop_table('count_by_schools')
+    op.rename_table('count_by_schools_new', 'count_by_schools')
+    op.execute("ALTER SEQUENCE count_by_schools_new_id_seq RENAME TO count_by_schools_id_seq")
+    op.execute("ALTER INDEX count_by_schools_new_pkey RENAME TO count_by_schools_pkey")
+    op.create_unique_constraint('uq_count_by_schools_natural_key', 'count_by_schools', ['school_id', 'year', 'campus_id', 'race_id', 'count_type'])
+
+
+def upgrade() -> None:
+    # a partitioned table cannot be made from an existing one, it is rebuilt
+    create_count_by_schools_new('LIST (year)')
+    # one partition per year, named like app.partitions.partition_name
+    years = op.get_bind().execute(sa.text("SELECT DISTINCT year FROM count_by_schools ORDER BY 1")).scalars().all()
+    for year in years:
+        op.execute(f"CREATE TABLE count_by_schools_{year} PARTITION OF count_by_schools_new FOR VALUES IN ({year})")
+    swap_count_by_schools_new()
+
+
+def downgrade() -> None:
+    create_count_by_schools_new(None)
+    # dropping count_by_schools drops its partitions
+    swap_count_by_schools_new()